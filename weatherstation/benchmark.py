@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""Benchmarks the encodings and storage backends for weather data
+
+Both benchmarks run on synthetic samples, taken the way the station
+takes its own: on its minute-long update loop, once per sampling period,
+with DHT readings in steps of 0.1 degrees C, logged in Fahrenheit.
+
+``codecs`` times encoding and decoding the samples with each encoding,
+and reports the throughput and the space each sample takes.
+
+``stores`` first checks that every storage backend, and the segmented
+one with each compression, behaves as the `data.WeatherStore` interface
+says it should, through a log writer, a restart and an expiry. It then
+fills each one with logs of each size and measures its startup time,
+append latency and range scan throughput, so a backend can be picked
+for a deployment on measured numbers.
+
+Usage:
+    ./benchmark.py codecs [-n RECORDS] [-p PERIOD] [-r REPEAT]
+    ./benchmark.py stores [-n RECORDS ...] [-p PERIOD] [-d DIRECTORY]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import math
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+import data
+import gorilla
+
+def synthetic_records(count, period=1800, seed=0):
+    """Generate weather records that change the way real ones do
+
+    Args:
+        count (int): The number of records to generate
+        period (float): The sampling period, in seconds
+        seed (int): The seed for the random jitter
+
+    Returns:
+        list: The records, oldest first
+    """
+    generator = random.Random(seed)
+    loop_time = 1600000000.0
+    last_time = None
+    records = []
+    while len(records) < count:
+        # The station samples on its update loop, which sleeps a minute
+        # after a DHT read that takes a fraction of a second, so samples
+        # land on the first tick after the period is up
+        loop_time += 60.2 + generator.gauss(0, 0.005)
+        if last_time is not None and loop_time - last_time < period:
+            continue
+        last_time = loop_time
+        # Times are kept to the microsecond, like the station's own
+        sample_time = round(loop_time, 6)
+        phase = 2 * math.pi * (sample_time % 86400) / 86400
+        # The DHT reads in steps of 0.1, so readings a few minutes apart
+        # are mostly the same, and the station logs temperatures in
+        # Fahrenheit, converted just as `sensors.convert_temp` does
+        temp_c = round(20 + 2 * math.sin(phase) + generator.gauss(0, 0.03), 1)
+        records.append(data.WeatherRecord(
+            sample_time,
+            (temp_c * (9/5)) + 32,
+            round(50 - 5 * math.sin(phase) + generator.gauss(0, 0.03), 1)
+        ))
+    return records
+
+def encode_json(records):
+    """Encode records as a JSON array, like the JSON log"""
+    return json.dumps([record.to_dict() for record in records]).encode()
+
+def decode_json(encoded):
+    """Decode records from a JSON array"""
+    return list(map(data.WeatherRecord.from_dict, json.loads(encoded)))
+
+def encode_json_lines(records):
+    """Encode records as JSON Lines, like a log segment"""
+    return ''.join(
+        json.dumps(record.to_dict()) + '\n' for record in records
+    ).encode()
+
+def decode_json_lines(encoded):
+    """Decode records from JSON Lines"""
+    return [
+        data.WeatherRecord.from_dict(json.loads(line))
+        for line in encoded.splitlines()
+    ]
+
+def encode_json_lines_gzip(records):
+    """Encode records as gzipped JSON Lines, like a closed segment"""
+    return gzip.compress(encode_json_lines(records))
+
+def decode_json_lines_gzip(encoded):
+    """Decode records from gzipped JSON Lines"""
+    return decode_json_lines(gzip.decompress(encoded))
+
+def encode_gorilla(records):
+    """Encode records as a Gorilla stream, like a closed segment"""
+    return gorilla.encode(
+        (record.time, record.temp, record.humidity) for record in records
+    )
+
+def decode_gorilla(encoded):
+    """Decode records from a Gorilla stream"""
+    return [data.WeatherRecord(*sample) for sample in gorilla.decode(encoded)]
+
+CODECS = {
+    'json': (encode_json, decode_json),
+    'jsonl': (encode_json_lines, decode_json_lines),
+    'jsonl+gzip': (encode_json_lines_gzip, decode_json_lines_gzip),
+    'gorilla': (encode_gorilla, decode_gorilla)
+}
+
+def best_time(function, argument, repeat):
+    """Return the fastest of several timed calls to a function"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def run_benchmarks(records, repeat=3):
+    """Time each codec against a set of records
+
+    Returns:
+        list: A (name, bits per record, encodes/s, decodes/s) tuple for
+            each codec
+    """
+    results = []
+    for name, (encoder, decoder) in CODECS.items():
+        encoded = encoder(records)
+        if len(decoder(encoded)) != len(records):
+            raise ValueError('{} lost records in the round trip'.format(name))
+        results.append((
+            name,
+            8 * len(encoded) / len(records),
+            len(records) / best_time(encoder, records, repeat),
+            len(records) / best_time(decoder, encoded, repeat)
+        ))
+    return results
+
+STORE_FILES = {
+    'json': 'weather.json',
+    'jsonl': 'weather.jsonl',
+    'sqlite': 'weather.db',
+    'segmented': 'weather',
+    'binary': 'weather.bin'
+}
+
+class ConformanceError(Exception):
+    """Raised when a storage backend doesn't behave as the interface says"""
+
+def expect(condition, message):
+    """Raise a `ConformanceError` unless a condition holds"""
+    if not condition:
+        raise ConformanceError(message)
+
+def check_store(store_class, path, records, **options):
+    """Check a storage backend against the `data.WeatherStore` interface
+
+    Records should have whole-second times and readings to two decimal
+    places, which every backend stores exactly, and should span a few
+    days, so that a segmented store is checked across several segments.
+    Only a few records are kept in memory, so older ones have to be read
+    back from disk. Along the way the store is snapshotted, written
+    through a `data.LogWriter`, reopened, and has its oldest records
+    expired and is reopened again.
+
+    Args:
+        store_class (type): The backend to check
+        path (str): Where to create the store
+        records (list): At least 100 records to store, oldest first
+        options: Any other options to create the store with
+
+    Raises:
+        ConformanceError: If the backend misbehaves
+    """
+    def open_store():
+        return store_class(path, memory_records=5, **options)
+
+    store = open_store()
+    expect(store.last_record.time == 0.0, 'new store has a last record')
+    expect(list(store.iter_records()) == [], 'new store has records')
+    head, tail = records[:-20], records[-20:]
+    for record in head:
+        store.add_record(record)
+        expect(store.last_record == record, 'last_record is not the newest')
+    snapshot = store.capture_snapshot()
+    if snapshot is not None:
+        store.write_snapshot(snapshot)
+    asyncio.run(check_writer(store, head, tail))
+    expect(list(store.iter_records()) == records,
+           'iter_records does not return every record in order')
+
+    start, end = records[10].datetime, records[90].datetime
+    expect(list(store.range(start, end)) == records[10:90],
+           'range does not return the records between its times')
+    expect(list(store.latest(5)) == records[-5:],
+           'latest does not return the newest records')
+    since, cursor = store.since(len(records) - 5)
+    expect(list(since) == records[-5:] and cursor == len(records),
+           'since does not return the records after its cursor')
+    temps = [record.temp for record in records[10:90]]
+    for threshold in (statistics.median(temps), max(temps)):
+        expect(store.select(start, end, min_temp=threshold) == [
+            record for record in records[10:90] if record.temp >= threshold
+        ], 'select does not filter by temperature')
+    expect(store.select(start, end, min_temp=max(temps) + 1) == [],
+           'select returns records out of bounds')
+
+    store.sync()
+    store.close()
+    store = open_store()
+    expect(store.last_record == records[-1], 'last record lost on reopen')
+    expect(list(store.iter_records()) == records, 'records lost on reopen')
+
+    cutoff = records[len(records) // 2].time
+    dropped = store.expire_records(cutoff)
+    kept = list(store.iter_records())
+    expect(dropped == len(records) - len(kept)
+           and kept == records[dropped:]
+           and all(record.time < cutoff for record in records[:dropped]),
+           'expire_records does not drop just the oldest records')
+    expect(dropped > 0, 'expire_records does not drop expired records')
+    store.close()
+    store = open_store()
+    expect(list(store.iter_records()) == kept,
+           'expired records come back on reopen')
+    since, cursor = store.since(0)
+    expect(list(since) == kept and cursor == len(records),
+           'since does not count expired records after reopening')
+    store.close()
+
+async def check_writer(store, head, tail):
+    """Check records written through a `data.LogWriter` in batches
+
+    While records are waiting to be written, reads may or may not see
+    them yet, but must be consistent with the order they were logged in.
+
+    Args:
+        store (data.WeatherStore): A store already holding `head`
+        head (list): The records already in the store
+        tail (list): The records to write through the writer
+    """
+    records = head + tail
+    writer = data.LogWriter(store, sync_policy='every-n-records',
+                            sync_records=8)
+    await writer.start()
+    try:
+        for record in tail:
+            await writer.add_record(record)
+        expect(store.last_record == tail[-1],
+               'last_record is not the newest queued record')
+
+        def newest():
+            return list(store.latest(len(tail)))
+        found = await writer.run_in_worker(newest)
+        expect(any(found == records[end - len(tail):end]
+                   for end in range(len(head), len(records) + 1)),
+               'latest is out of step with the records being written')
+        found, cursor = await writer.since(len(head) - 5)
+        expect(found == records[len(head) - 5:cursor] and cursor >= len(head),
+               'since is out of step with the records being written')
+    finally:
+        await writer.stop()
+    expect(list(store.latest(len(tail))) == tail,
+           'latest does not return records written in batches')
+    found, cursor = store.since(len(head))
+    expect(list(found) == tail and cursor == len(records),
+           'since does not return records written in batches')
+
+def fill_store(store_class, path, records, batch_size=10000):
+    """Create a store holding the records, writing them in large batches"""
+    store = store_class(path)
+    for index in range(0, len(records), batch_size):
+        store.write_records(records[index:index + batch_size])
+    store.sync()
+    store.close()
+    # Open it once more, so the rollups are caught up before timing
+    store_class(path).close()
+
+def measure_store(store_class, path, records, appends=200):
+    """Measure a filled store
+
+    Returns:
+        tuple: The startup time in seconds, the median and 99th percentile
+            append latency in seconds, and the range scan rate in records
+            per second
+    """
+    start = time.perf_counter()
+    store = store_class(path)
+    startup = time.perf_counter() - start
+
+    period = records[-1].time - records[-2].time
+    latencies = []
+    for index in range(1, appends + 1):
+        last = records[-1]
+        record = data.WeatherRecord(last.time + index * period,
+                                    last.temp, last.humidity)
+        start = time.perf_counter()
+        store.add_record(record)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    start = time.perf_counter()
+    scanned = sum(1 for _ in store.range(records[0].datetime,
+                                          records[-1].datetime))
+    scan_rate = scanned / (time.perf_counter() - start)
+    store.close()
+    return (startup, statistics.median(latencies),
+            latencies[int(len(latencies) * 0.99) - 1], scan_rate)
+
+def run_store_benchmarks(sizes, period, directory=None):
+    """Check every storage backend, then measure it at each log size
+
+    Yields:
+        tuple: The format, record count, startup time, median and 99th
+            percentile append latency and scan rate for each run
+    """
+    work = tempfile.mkdtemp(prefix='wetspec-', dir=directory)
+    try:
+        # Half-hourly samples over a few days, so the segmented store has
+        # several segments to check. The binary log keeps whole seconds
+        # and hundredths, so the sample is cut to what it can hold.
+        sample = [
+            data.WeatherRecord(float(int(record.time)), round(record.temp, 2),
+                               record.humidity)
+            for record in synthetic_records(150, 1800)
+        ]
+        checks = [(name, name, {}) for name in data.LOGGER_FORMATS]
+        checks.extend(
+            ('segmented+' + compression, 'segmented',
+             {'compression': compression})
+            for compression in data.SEGMENT_COMPRESSION
+        )
+        for label, name, options in checks:
+            try:
+                check_store(data.LOGGER_FORMATS[name],
+                            os.path.join(work, 'check-{}-{}'.format(
+                                label.replace('+', '-'), STORE_FILES[name])),
+                            sample, **options)
+            except ConformanceError as error:
+                raise ConformanceError('{}: {}'.format(label, error))
+
+        for size in sizes:
+            records = synthetic_records(size, period)
+            for name, store_class in data.LOGGER_FORMATS.items():
+                path = os.path.join(work, '{}-{}'.format(size,
+                                                     STORE_FILES[name]))
+                fill_store(store_class, path, records)
+                yield (name, size) + measure_store(store_class, path, records)
+    finally:
+        shutil.rmtree(work)
+
+def run_codecs(args):
+    """Print the codec benchmark table"""
+    records = synthetic_records(args.records, args.period)
+    print('{:<12s}{:>14s}{:>16s}{:>16s}'.format(
+        'encoding', 'bits/record', 'encode rec/s', 'decode rec/s'))
+    for name, bits, encode_rate, decode_rate in run_benchmarks(records,
+                                                               args.repeat):
+        print('{:<12s}{:>14.1f}{:>16,.0f}{:>16,.0f}'.format(
+            name, bits, encode_rate, decode_rate))
+
+def run_stores(args):
+    """Print the storage backend benchmark matrix"""
+    print('{:<11s}{:>10s}{:>12s}{:>14s}{:>14s}{:>14s}'.format(
+        'format', 'records', 'startup ms', 'append us', 'p99 us',
+        'scan rec/s'))
+    for name, size, startup, median, p99, scan_rate in run_store_benchmarks(
+            args.records, args.period, args.directory):
+        print('{:<11s}{:>10,d}{:>12.1f}{:>14.1f}{:>14.1f}{:>14,.0f}'.format(
+            name, size, startup * 1e3, median * 1e6, p99 * 1e6, scan_rate),
+            flush=True)
+
+def main():
+    """Run the benchmarks from the command line"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the weather data encodings and stores'
+    )
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    codecs = subparsers.add_parser('codecs', help='compare the encodings')
+    codecs.add_argument('-n', '--records', type=int, default=10000,
+                        help='number of samples to encode')
+    codecs.add_argument('-p', '--period', type=float, default=1800,
+                        help='sampling period, in seconds')
+    codecs.add_argument('-r', '--repeat', type=int, default=3,
+                        help='timed runs per codec, keeping the fastest')
+
+    stores = subparsers.add_parser(
+        'stores', help='check and compare the storage backends'
+    )
+    stores.add_argument('-n', '--records', type=int, nargs='+',
+                        default=[10000, 100000, 1000000],
+                        help='log sizes to measure')
+    # A short period keeps a million samples to a couple of years, so the
+    # segmented store isn't measured on tens of thousands of segments
+    stores.add_argument('-p', '--period', type=float, default=60,
+                        help='sampling period, in seconds')
+    stores.add_argument('-d', '--directory',
+                        help='where to create the stores, by default the '
+                        'system temporary directory')
+    args = parser.parse_args()
+
+    if args.benchmark == 'codecs':
+        if args.records < 1:
+            parser.error('need at least one record')
+        run_codecs(args)
+    else:
+        if min(args.records) < 2:
+            parser.error('need at least two records')
+        try:
+            run_stores(args)
+        except ConformanceError as error:
+            parser.exit(1, 'Conformance check failed: {}\n'.format(error))
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,30 @@
 """Implements the physical controls for the weather station
 
 This module provides the two physical control devices for the GrovePi
-WeatherStation.
+WeatherStation. Coroutines read them with ``await control.read()``,
+which runs the read on the GrovePi bus thread.
 
 Classes:
     Button
     RotaryDial
 """
 
-import asyncio
 import logging
 import grovepi #pylint: disable=import-error
 
+import grovebus
+
 class Button:
     """Implements a button control
 
-    The button control offers both instant-read and asynchronous watch
-    capabilities.
+    The button control offers both instant and asynchronous reads. The
+    station's input sampler watches for presses with the latter.
     """
-    def __init__(self, port):
+    def __init__(self, port, bus=grovebus.BUS):
         """Init the button on the provided port"""
         self.__port = port
         self.__pressed = False
-        self.monitor = None
+        self.bus = bus
         grovepi.pinMode(self.__port, "INPUT")
         logging.debug('Button initialized on port %s', self.__port)
 
@@ -39,10 +41,18 @@ class Button:
             self.__pressed = grovepi.digitalRead(self.__port)
         return self.__pressed
 
-    async def start_monitor(self):
-        """Starts a monitor to watch for button presses"""
-        self.monitor = asyncio.create_task(self.watch())
-        logging.info('Started button monitor')
+    async def read(self):
+        """Returns ``True`` if the button has been pressed, read on the bus
+
+        Like `pressed`, the button is sticky, and is only read if it
+        hasn't been pressed yet.
+        """
+        if not self.__pressed:
+            # The program may press the button while the read is on the bus
+            if await self.bus.read(grovebus.PRIORITY_BUTTON,
+                                   grovepi.digitalRead, self.__port):
+                self.__pressed = True
+        return self.__pressed
 
     def press_button(self):
         """Programmatically "press" the button"""
@@ -60,12 +70,6 @@ class Button:
         else:
             logging.debug('Program tried to reset the button (not yet pressed)')
 
-    async def watch(self):
-        """Watches asynchronously for a button press"""
-        while not self.pressed:
-            await asyncio.sleep(0.05)
-        logging.info('Stopped button monitor')
-
 class RotaryDial:
     """Implements a rotary dial with variable partitioning
 
@@ -75,9 +79,10 @@ class RotaryDial:
     Attributes:
         num_partitions (int): The number of discrete values to produce
     """
-    def __init__(self, port, num_partitions=16):
+    def __init__(self, port, num_partitions=16, bus=grovebus.BUS):
         self.__port = port
         self.__num_partitions = num_partitions
+        self.bus = bus
         grovepi.pinMode(self.__port, "INPUT")
         logging.debug('Dial initialized with %s partitions on port %s',
                       self.__num_partitions, self.__port)
@@ -97,8 +102,18 @@ class RotaryDial:
     @property
     def value(self):
         """Returns the current dial value based on the number of partitions"""
+        return self.partition(grovepi.analogRead(self.__port))
+
+    async def read(self):
+        """Returns the current dial value, reading the dial on the bus"""
+        return self.partition(await self.bus.read(grovebus.PRIORITY_DIAL,
+                                                  grovepi.analogRead,
+                                                  self.__port))
+
+    def partition(self, raw_value):
+        """Returns the partition that a raw dial value falls in"""
         partition_size = int(1024 / self.num_partitions)
-        return int(grovepi.analogRead(self.__port) / partition_size)
+        return int(raw_value / partition_size)
 
     @property
     def raw_value(self):
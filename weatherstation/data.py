@@ -3,22 +3,484 @@
 Since we use basic logging config for runtime logging, we're only using
 this component to provide JSON data logging for the actual weather data.
 """
+import abc
+import argparse
+import array
+import asyncio
+import bisect
+import collections
+import concurrent.futures
 import datetime as dt
+import gzip
+import itertools
 import json
 import logging
+import lzma
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import textwrap
+import threading
 
-class WeatherLogger:
-    """Implements a JSON logger for weather data"""
-    def __init__(self, path):
+import gorilla
+
+class WeatherRecord:
+    """A single weather reading
+
+    Records keep their time as UTC epoch seconds, so comparing and
+    sorting them never involves parsing dates. They are only converted
+    to and from ISO 8601 strings when they are written out or read in.
+    Slots keep each record to a fraction of the size of the equivalent
+    dict, which adds up over years of readings.
+
+    Attributes:
+        time (float): The time of the reading, in UTC epoch seconds
+        temp (float): The temperature reading
+        humidity (float): The relative humidity reading
+    """
+    __slots__ = ('time', 'temp', 'humidity')
+
+    def __init__(self, time, temp, humidity):
+        self.time = time
+        self.temp = temp
+        self.humidity = humidity
+
+    def __eq__(self, other):
+        if not isinstance(other, WeatherRecord):
+            return NotImplemented
+        return ((self.time, self.temp, self.humidity)
+                == (other.time, other.temp, other.humidity))
+
+    def __repr__(self):
+        return 'WeatherRecord({!r}, {!r}, {!r})'.format(
+            self.time, self.temp, self.humidity)
+
+    @classmethod
+    def from_dict(cls, record):
+        """Create a record from its JSON form, with an ISO 8601 time"""
+        return cls(
+            dt.datetime.fromisoformat(record['time']).timestamp(),
+            record['temp'],
+            record['humidity']
+        )
+
+    def to_dict(self):
+        """Return the JSON form of the record, with an ISO 8601 time"""
+        return {
+            'time': self.datetime.isoformat(),
+            'temp': self.temp,
+            'humidity': self.humidity
+        }
+
+    @property
+    def datetime(self):
+        """Return the time of the reading as a UTC datetime"""
+        return dt.datetime.fromtimestamp(self.time, dt.timezone.utc)
+
+class RecordView:
+    """A lazy, read-only view of a run of records in a weather log
+
+    Views hold nothing but the positions of the first and last records
+    in the run, so they are cheap to create however many records they
+    cover. Records are only read, from memory where possible and from
+    disk otherwise, when the view is iterated or indexed.
+
+    Args:
+        logger (WeatherLogger): The logger holding the records
+        start (int): The position of the first record in the view
+        stop (int): The position just past the last record in the view
+    """
+    def __init__(self, logger, start, stop):
+        self.logger = logger
+        self.start = start
+        self.stop = max(start, stop)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        return self.logger.read_records(self.start, self.stop)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('Record views do not support slice steps')
+            return RecordView(self.logger, self.start + start,
+                              self.start + stop)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Record view index out of range')
+        position = self.start + index
+        return next(self.logger.read_records(position, position + 1))
+
+    def __repr__(self):
+        return '<RecordView of {} records>'.format(len(self))
+
+class FieldStats:
+    """Running min/max/mean/count of one field of the weather records
+
+    Readings of ``None`` are left out, so each field keeps its own count.
+    """
+    __slots__ = ('count', 'min', 'max', 'total')
+
+    def __init__(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total = 0.0
+
+    def add(self, value):
+        """Fold a new reading into the stats"""
+        if value is None:
+            return
+        if self.count == 0:
+            self.min = self.max = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        self.count += 1
+        self.total += value
+
+    def state(self):
+        """Return everything needed to carry on from the stats, as a list"""
+        return [self.count, self.min, self.max, self.total]
+
+    @classmethod
+    def from_state(cls, state):
+        """Create stats carrying on from a saved `state()`"""
+        stats = cls()
+        stats.count, stats.min, stats.max, stats.total = state
+        return stats
+
+    def to_dict(self):
+        """Return the JSON form of the stats"""
+        return {
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            'count': self.count
+        }
+
+class Rollup:
+    """The aggregated temperature and humidity for one hour or day
+
+    Args:
+        period (str): The length of the rollup, ``'hour'`` or ``'day'``
+        start (float): The start of the rollup, in UTC epoch seconds
+    """
+    __slots__ = ('period', 'start', 'count', 'temp', 'humidity')
+
+    def __init__(self, period, start):
+        self.period = period
+        self.start = start
+        self.count = 0
+        self.temp = FieldStats()
+        self.humidity = FieldStats()
+
+    def add(self, record):
+        """Fold a new record into the rollup"""
+        self.count += 1
+        self.temp.add(record.temp)
+        self.humidity.add(record.humidity)
+
+    def state(self):
+        """Return everything needed to carry on from the rollup"""
+        return {
+            'period': self.period,
+            'start': self.start,
+            'count': self.count,
+            'temp': self.temp.state(),
+            'humidity': self.humidity.state()
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Create a rollup carrying on from a saved `state()`"""
+        rollup = cls(state['period'], state['start'])
+        rollup.count = state['count']
+        rollup.temp = FieldStats.from_state(state['temp'])
+        rollup.humidity = FieldStats.from_state(state['humidity'])
+        return rollup
+
+    def to_dict(self):
+        """Return the JSON form of the rollup, with an ISO 8601 start"""
+        return {
+            'period': self.period,
+            'start': dt.datetime.fromtimestamp(
+                self.start, dt.timezone.utc).isoformat(),
+            'count': self.count,
+            'temp': self.temp.to_dict(),
+            'humidity': self.humidity.to_dict()
+        }
+
+class Rollups:
+    """Keeps hourly and daily aggregates of the weather log up to date
+
+    Each new record is folded into the open rollup for its hour and its
+    day, which costs the same however long the log is. When a record
+    falls into a new hour or day, the old rollup is closed and queued to
+    be appended, as a JSON line, to the rollup file next to the raw log.
+    Readers can then chart aggregates without rescanning raw samples.
+
+    Hours and days are UTC. Open rollups are only stored in the log's
+    snapshot. Without one, the logger replays the records since the last
+    closed rollup of each period, which is at most a day's worth.
+
+    Args:
+        path (str): The path to the rollup file
+        state (dict): The `state()` of the rollups to carry on from, or
+            ``None`` to pick up from the rollup file
+    """
+    PERIODS = {'hour': 3600, 'day': 86400}
+
+    def __init__(self, path, state=None):
+        self.path = path
+        self.open = {}
+        self.pending = []
+        self.resume_times = {period: 0.0 for period in self.PERIODS}
+        self.last_time = 0.0
+        if state is not None:
+            self.resume_times.update(state['resume_times'])
+            self.last_time = state['last_time']
+            for rollup_state in state['open']:
+                rollup = Rollup.from_state(rollup_state)
+                self.open[rollup.period] = rollup
+            return
+        # Rollups are appended oldest first, so only the last of each
+        # period matters, and the file is read back from its end to find it
+        missing = set(self.PERIODS)
+        try:
+            with open(self.path, 'rb') as rollup_file:
+                for rollup in iter_json_lines_reversed(rollup_file):
+                    period = rollup['period']
+                    if period not in missing:
+                        continue
+                    missing.discard(period)
+                    self.resume_times[period] = (
+                        dt.datetime.fromisoformat(rollup['start']).timestamp()
+                        + self.PERIODS[period]
+                    )
+                    if not missing:
+                        break
+        except FileNotFoundError:
+            pass
+
+    @property
+    def resume_time(self):
+        """The time of the first record the rollups haven't covered yet"""
+        return max(min(self.resume_times.values()), self.last_time)
+
+    def state(self):
+        """Return everything needed to carry on from the rollups
+
+        Closed rollups are kept in the file, so only the open ones are
+        included. Don't save the state while closed rollups are pending.
+        """
+        return {
+            'resume_times': dict(self.resume_times),
+            'last_time': self.last_time,
+            'open': [rollup.state() for rollup in self.open.values()]
+        }
+
+    def add(self, record):
+        """Fold a new record into the open hourly and daily rollups"""
+        if record.time <= self.last_time:
+            # Already folded in before the snapshot was taken
+            return
+        self.last_time = record.time
+        for period, length in self.PERIODS.items():
+            if record.time < self.resume_times[period]:
+                continue
+            start = record.time - record.time % length
+            rollup = self.open.get(period)
+            if rollup is None or rollup.start != start:
+                if rollup is not None:
+                    self.pending.append(rollup)
+                rollup = self.open[period] = Rollup(period, start)
+            rollup.add(record)
+
+    def flush(self):
+        """Append the rollups closed since the last flush to the file"""
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        with open(self.path, 'a') as rollup_file:
+            rollup_file.writelines(
+                json.dumps(rollup.to_dict()) + '\n' for rollup in pending
+            )
+        for rollup in pending:
+            self.resume_times[rollup.period] = (rollup.start
+                                                + self.PERIODS[rollup.period])
+
+    def iter_rollups(self, period):
+        """Iterate over the rollups for a period, oldest first
+
+        The closed rollups are streamed from the file, followed by any
+        that haven't been written yet and the one still open.
+
+        Args:
+            period (str): Either ``'hour'`` or ``'day'``
+
+        Yields:
+            dict: The JSON form of each rollup
+        """
+        pending = list(self.pending)
+        try:
+            with open(self.path, 'rb') as rollup_file:
+                for rollup in iter_json_lines(rollup_file):
+                    if rollup['period'] == period:
+                        yield rollup
+        except FileNotFoundError:
+            pass
+        for rollup in pending:
+            if rollup.period == period:
+                yield rollup.to_dict()
+        if period in self.open:
+            yield self.open[period].to_dict()
+
+class PageCache:
+    """A least-recently-used cache of pages of records read from disk
+
+    Args:
+        capacity (int): The most pages to keep, or 0 to cache nothing
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.pages = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return a cached page, or ``None`` if it isn't cached"""
+        page = self.pages.get(key)
+        if page is None:
+            self.misses += 1
+            return None
+        self.pages.move_to_end(key)
+        self.hits += 1
+        return page
+
+    def put(self, key, page):
+        """Cache a page, evicting the least recently used if it's full"""
+        if self.capacity <= 0:
+            return
+        self.pages[key] = page
+        self.pages.move_to_end(key)
+        while len(self.pages) > self.capacity:
+            self.pages.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached page"""
+        self.pages.clear()
+
+class WeatherStore(abc.ABC):
+    """The interface every weather data storage backend implements
+
+    A store keeps weather records in time order. Backends differ in how
+    they lay the records out on disk, but every one of them supports:
+
+    * `append()` and `add_record()` to add a record
+    * `last_record` for the newest record
+    * `range()`, `latest()` and `select()` to query records by time
+    * `iter_records()` to stream every record, oldest first
+    * `sync()` to flush everything written out to storage
+    * `close()` to release whatever the backend holds open
+
+    The station and `LogWriter` only use this interface, so the backend
+    can be picked per deployment with ``data_format`` in the config.
+    ``benchmark.py stores`` checks every backend against the interface
+    and measures them side by side.
+
+    Every store also keeps hourly and daily aggregates in `rollups`,
+    stored next to the log in the file named by `rollup_path`, and can
+    drop raw records past a retention window with `expire_records()`,
+    leaving the hourly rollups in their place.
+
+    After each write, the newest record written, its `sequence` number,
+    a count of every record the store has ever logged, and the open
+    rollups are written to the small JSON file named by `latest_path`.
+    Pollers can read the current conditions from there instead of
+    downloading the whole log. Through a `LogWriter`, the file is only
+    written once a batch is synced, so it lags behind `last_record` by
+    whatever is still pending.
+
+    The record numbered `sequence` is the newest, and the numbers count
+    back from there, so a consumer can keep the number of the last
+    record it has seen as a cursor and fetch only what is new with
+    `since()`.
+
+    Args:
+        path (str): The path to the weather data file
+        memory_records (int): How many of the most recent records to keep
+            in memory, or ``None`` to keep them all
+        memory_bytes (int): A cap on the memory the in-memory records
+            take, on top of `memory_records`, or ``None`` for no cap
+        keep_rollups (bool): Maintain rollups for the log. Stores used
+            internally, like the segments of a segmented log, don't.
+    """
+    def __init__(self, path, memory_records=1000, memory_bytes=None,
+                 keep_rollups=True):
+        if memory_bytes is not None:
+            limit = max(1, memory_bytes // RECORD_BYTES)
+            if memory_records is None or memory_records > limit:
+                memory_records = limit
         self.log_path = path
+        self.memory_records = memory_records
+        self.generation = 0
+        self.snapshot_rollups = None
         try:
-            with open(self.log_path) as log_file:
-                self.log_data = json.load(log_file)
+            self.load_log()
             logging.debug('Weather log file loaded successfully')
         except FileNotFoundError:
-            self.log_data = []
+            self.log_data = self.new_log_data()
             self.write_log()
             logging.debug('New weather log created at %s', self.log_path)
+        self.rollups = None
+        self.sequence = 0
+        if keep_rollups:
+            self.load_rollups()
+            self.sequence = self.load_sequence()
+        # The number of records logged before the first one still in the
+        # log, which retention drops from the front
+        self.dropped = self.sequence - self.count_records()
+        self.snapshot_rollups = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a store from the station config dict"""
+        return cls(
+            config['data_file'],
+            memory_records=config.get('memory_records', 1000),
+            memory_bytes=config.get('memory_bytes')
+        )
+
+    def new_log_data(self):
+        """Return an empty deque to hold the in-memory records"""
+        return collections.deque(maxlen=self.memory_records)
+
+    def sidecar_path(self, name):
+        """Return the path of a file that sits next to the log
+
+        The log's whole name, extension and all, is kept in the sidecar's,
+        so logs of different formats can share a directory.
+        """
+        return os.path.normpath(self.log_path) + '-' + name
+
+    @property
+    def rollup_path(self):
+        """The path of the rollup file that sits next to the log"""
+        return self.sidecar_path('rollups.jsonl')
+
+    @property
+    def latest_path(self):
+        """The path of the latest reading file that sits next to the log"""
+        return self.sidecar_path('latest.json')
 
     @property
     def last_record(self):
@@ -26,12 +488,8 @@ class WeatherLogger:
         if len(self.log_data) > 0:
             return self.log_data[-1]
 
-        # If we don't have a record, return a null record with min datetime
-        return {
-            'time': dt.datetime.min.isoformat(),
-            'temp': None,
-            'humidity': None
-        }
+        # If we don't have a record, return a null record from the epoch
+        return WeatherRecord(0.0, None, None)
 
     def append(self, temp, humidity, interval):
         """Append a record to the weather log
@@ -42,24 +500,2283 @@ class WeatherLogger:
         for the tendency of my indoor lighting to magically nail the
         threshold, no matter where I set it...)
         """
-        current_time = dt.datetime.now(dt.timezone.utc)
-        last_time = dt.datetime.fromisoformat(self.last_record['time'])
-        delta_t = current_time - last_time
+        record = self.new_record(temp, humidity, interval)
+        if record is None:
+            return False
+        self.add_record(record)
+        return True
+
+    def new_record(self, temp, humidity, interval):
+        """Build a new record, if the interval has passed since the last one
+
+        Returns:
+            WeatherRecord: The new record, or ``None`` if it isn't due yet
+        """
+        current_time = dt.datetime.now(dt.timezone.utc).timestamp()
 
         # Only append if the specified interval has passed since last data point
-        if delta_t.total_seconds() >= interval:
-            self.log_data.append(
-                {
-                    'time': current_time.isoformat(),
-                    'temp': temp,
-                    'humidity': humidity
-                }
-            )
+        if current_time - self.last_record.time >= interval:
+            return WeatherRecord(current_time, temp, humidity)
+        return None
+
+    def add_record(self, record):
+        """Add a new record to the log, both in memory and on disk"""
+        self.remember_record(record)
+        self.track_record(record)
+        self.write_record(record)
+        self.write_sidecars(record, self.sequence)
+
+    def track_record(self, record):
+        """Count a new record and fold it into the rollups"""
+        self.sequence += 1
+        self.rollups.add(record)
+
+    def write_sidecars(self, record, sequence):
+        """Bring the files kept beside the log up to date after a write
+
+        Args:
+            record (WeatherRecord): The newest record written to the log
+            sequence (int): The sequence number of that record
+        """
+        self.rollups.flush()
+        self.write_latest(record, sequence)
+
+    def write_latest(self, record, sequence):
+        """Atomically write the newest record, rollups and sequence number
+
+        Args:
+            record (WeatherRecord): The newest record written to the log
+            sequence (int): The sequence number of that record
+        """
+        write_json_atomic(self.latest_path, {
+            'sequence': sequence,
+            'record': record.to_dict(),
+            'rollups': {
+                rollup.period: rollup.to_dict()
+                for rollup in list(self.rollups.open.values())
+            }
+        })
+
+    def load_sequence(self):
+        """Work out the sequence number of the newest record on startup
+
+        The latest reading file holds the sequence number as of the last
+        write, so only the records logged after it need counting. Without
+        one, every record in the log is counted.
+        """
+        try:
+            with open(self.latest_path) as latest_file:
+                latest = json.load(latest_file)
+            sequence = latest['sequence']
+            last_time = WeatherRecord.from_dict(latest['record']).time
+        except FileNotFoundError:
+            return self.count_records()
+        except (KeyError, TypeError, ValueError):
+            logging.warning('Unreadable %s. Counting the records in the log',
+                            self.latest_path)
+            return self.count_records()
+        start = dt.datetime.fromtimestamp(last_time, dt.timezone.utc)
+        end = dt.datetime.max.replace(tzinfo=dt.timezone.utc)
+        return sequence + sum(
+            1 for record in self.range(start, end) if record.time > last_time
+        )
+
+    def since(self, cursor):
+        """Return the records logged after a cursor
+
+        Records are found by their position from the front of the log,
+        which new records don't move, so a record logged during the call
+        is either returned with a cursor that covers it or left for the
+        next call. Through a `LogWriter`, use `LogWriter.since()`, which
+        reads in step with the writes.
+
+        Args:
+            cursor (int): The sequence number of the last record already
+                seen, or 0 to fetch the whole log
+
+        Returns:
+            tuple: The new records, oldest first, and the cursor to pass
+                next time
+        """
+        if cursor > self.sequence:
+            logging.warning('Cursor %d is past the newest weather record, '
+                            'which is %d. Starting from the oldest',
+                            cursor, self.sequence)
+            cursor = 0
+        if cursor < self.dropped:
+            logging.info('Records %d to %d have expired since cursor %d',
+                         cursor + 1, self.dropped, cursor)
+        start = max(0, cursor - self.dropped)
+        records = self.records_from(start)
+        return records, self.dropped + start + len(records)
+
+    def load_rollups(self):
+        """Load the rollups, catching them up with the records in the log"""
+        self.rollups = Rollups(self.rollup_path, self.snapshot_rollups)
+        resume = dt.datetime.fromtimestamp(self.rollups.resume_time,
+                                           dt.timezone.utc)
+        end = dt.datetime.max.replace(tzinfo=dt.timezone.utc)
+        for record in self.range(resume, end):
+            self.rollups.add(record)
+        self.rollups.flush()
+
+    def remember_record(self, record):
+        """Add a new record to the in-memory log data"""
+        self.log_data.append(record)
+
+    def write_record(self, record):
+        """Write a single new record to the log file"""
+        self.write_records([record])
+
+    def select(self, start, end, min_temp=None, max_temp=None,
+               min_humidity=None, max_humidity=None):
+        """Return the records between two times with readings in bounds
+
+        Bounds are inclusive, and any left as ``None`` aren't checked.
+        Records missing a reading that has bounds are left out.
+
+        Args:
+            start (datetime): The earliest time to include
+            end (datetime): The time to stop at (exclusive)
+            min_temp (float): The lowest temperature to include
+            max_temp (float): The highest temperature to include
+            min_humidity (float): The lowest humidity to include
+            max_humidity (float): The highest humidity to include
+
+        Returns:
+            list: The matching records, oldest first
+        """
+        return [
+            record for record in self.range(start, end)
+            if in_bounds(record.temp, min_temp, max_temp)
+            and in_bounds(record.humidity, min_humidity, max_humidity)
+        ]
+
+    def expire_records(self, before):
+        """Drop the raw records logged before a time
+
+        Only records already covered by a stored hourly rollup are
+        dropped, so the history is downsampled rather than lost.
+
+        Args:
+            before (float): The cutoff time, in UTC epoch seconds
+
+        Returns:
+            int: The number of records dropped
+        """
+        before = min(before, self.rollups.resume_times['hour'])
+        count = self.drop_records(before)
+        if count:
+            self.dropped += count
+            self.generation += 1
+            self.clear_caches()
+            logging.info('Expired %d weather records from %s',
+                         count, self.log_path)
+        return count
+
+    def capture_snapshot(self):
+        """Capture the state to save in a snapshot
+
+        Only stores that index their whole log on startup take snapshots,
+        so by default there's nothing to capture.
+
+        Returns:
+            dict: The captured state, or ``None`` if there's nothing to
+                snapshot right now
+        """
+        return None
+
+    def clear_caches(self):
+        """Drop anything cached from the log, after it has been rewritten"""
+
+    def close(self):
+        """Release anything the store holds open"""
+
+    @abc.abstractmethod
+    def load_log(self):
+        """Load the log from disk, raising FileNotFoundError if it's new"""
+
+    @abc.abstractmethod
+    def write_log(self):
+        """Write out a new log holding the in-memory records"""
+
+    @abc.abstractmethod
+    def write_records(self, records):
+        """Append new records to the log on disk"""
+
+    @abc.abstractmethod
+    def iter_records(self):
+        """Iterate over every record in the log, oldest first"""
+
+    @abc.abstractmethod
+    def range(self, start, end):
+        """Return the records logged between two times, oldest first
+
+        Args:
+            start (datetime): The earliest time to include
+            end (datetime): The time to stop at (exclusive)
+        """
+
+    @abc.abstractmethod
+    def latest(self, count):
+        """Return the most recent records, oldest first
+
+        Args:
+            count (int): The number of records to include
+        """
+
+    @abc.abstractmethod
+    def count_records(self):
+        """Return the number of records in the log"""
+
+    @abc.abstractmethod
+    def records_from(self, start):
+        """Return the records from a position in the log to its end
+
+        Args:
+            start (int): The position of the first record, counting from
+                the oldest record in the log at 0
+        """
+
+    @abc.abstractmethod
+    def drop_records(self, before):
+        """Remove the records logged before a time, returning how many"""
+
+    @abc.abstractmethod
+    def sync(self):
+        """Force everything written to the log out to storage"""
+
+class WeatherLogger(WeatherStore):
+    """Implements a JSON logger for weather data
+
+    The log is a single JSON array, which is what the dashboard charts.
+    New records are spliced in over the closing bracket rather than
+    rewriting the array, so appends stay cheap as the log grows. The log
+    is streamed in on startup, and only its most recent records are kept
+    in memory; `iter_records()` streams the full history from disk.
+
+    While loading, the logger builds an index of each record's time and
+    position in the file. `range()` and `latest()` binary search the
+    index and return a `RecordView`, which reads just the records it
+    covers, so time-range queries cost O(log N + k) for k records.
+    Records older than the in-memory tail are paged in from disk a page
+    at a time, through a small LRU cache, so memory stays flat however
+    long the station runs.
+
+    Views taken before `expire_records()` drops records no longer line up
+    with the log, and should be taken again.
+
+    The index and open rollups can be saved to a snapshot beside the log.
+    When the snapshot matches the log, startup loads it and only reads
+    the records written since, treating the log as its journal, so
+    restarting doesn't get slower as the history grows.
+
+    Args:
+        path (str): The path to the weather data file
+        compact (bool): Write records without indentation or spaces
+        cache_pages (int): How many pages of older records to cache
+        options: The options every `WeatherStore` takes
+    """
+    PAGE_RECORDS = 256
+
+    def __init__(self, path, compact=False, cache_pages=16, **options):
+        self.compact = compact
+        self.times = array.array('d')
+        self.offsets = array.array('q')
+        self.page_cache = PageCache(cache_pages)
+        super().__init__(path, **options)
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a logger from the station config dict"""
+        return cls(
+            config['data_file'],
+            compact=config.get('data_layout') == 'compact',
+            cache_pages=config.get('cache_pages', 16),
+            memory_records=config.get('memory_records', 1000),
+            memory_bytes=config.get('memory_bytes')
+        )
+
+    @property
+    def snapshot_path(self):
+        """The path of the snapshot file that sits next to the log"""
+        return self.sidecar_path('snapshot.bin')
+
+    def new_log_data(self):
+        """Return an empty deque to hold the in-memory records
+
+        The deque is unbounded, and `trim_memory()` trims it back to
+        `memory_records` as records are added, because records can only be
+        dropped from memory once they have been written and can be paged
+        back in from disk.
+        """
+        return collections.deque()
+
+    def trim_memory(self):
+        """Drop the oldest in-memory records past `memory_records`
+
+        Records that haven't been written out yet have no offset in the
+        index to page them back in from, so they are kept however many
+        are waiting. This only runs as records are added, never from
+        `write_records()`, which a `LogWriter` calls on its own thread.
+        """
+        if self.memory_records is None:
+            return
+        memory_start = len(self.times) - len(self.log_data)
+        written = max(0, len(self.offsets) - memory_start)
+        for _ in range(min(len(self.log_data) - self.memory_records, written)):
+            self.log_data.popleft()
+
+    def remember_record(self, record):
+        """Add a new record to the in-memory log data and the time index"""
+        self.log_data.append(record)
+        self.times.append(record.time)
+        self.trim_memory()
+
+    def load_log(self):
+        """Load the log, from its snapshot if there's a usable one
+
+        Without a snapshot, the whole log is streamed in and indexed,
+        keeping only its tail in memory. With one, only the records
+        written since are read, and the tail is read back through the
+        index.
+        """
+        self.generation += 1
+        self.page_cache.clear()
+        self.log_data = self.new_log_data()
+        if self.load_snapshot():
+            self.log_data.clear()
+            total = len(self.times)
+            count = total
+            if self.memory_records is not None:
+                count = min(total, self.memory_records)
+            self.log_data.extend(list(self.read_records(total - count, total)))
+            return
+        self.times = array.array('d')
+        self.offsets = array.array('q')
+        self.index_log()
+
+    def index_log(self, start=None):
+        """Stream in the log from an offset, indexing each record
+
+        Args:
+            start (int): The offset of the first record to read, or
+                ``None`` to read the whole log
+        """
+        with open(self.log_path, 'rb') as log_file:
+            for offset, element in scan_json_array(log_file, start):
+                record = WeatherRecord.from_dict(element)
+                self.log_data.append(record)
+                self.times.append(record.time)
+                self.offsets.append(offset)
+                self.trim_memory()
+
+    def load_snapshot(self):
+        """Restore the index and rollups from the snapshot, if it matches
+
+        The snapshot records the log file's inode and its last indexed
+        record, so a log that has been rewritten or replaced since is
+        caught, and the log is loaded in full instead. The records after
+        the snapshot are then replayed from the log.
+
+        Returns:
+            bool: ``True`` if the snapshot was used
+        """
+        inode = os.stat(self.log_path).st_ino
+        try:
+            with open(self.snapshot_path, 'rb') as snapshot_file:
+                header = json.loads(snapshot_file.readline())
+                if (header['inode'] != inode
+                        or header['byteorder'] != sys.byteorder):
+                    raise ValueError('the log has changed')
+                times = array.array('d')
+                times.fromfile(snapshot_file, header['count'])
+                offsets = array.array('q')
+                offsets.fromfile(snapshot_file, header['count'])
+            self.times, self.offsets = times, offsets
+            count = len(times)
+            last_record = next(self.read_records(count - 1, count))
+            if last_record != WeatherRecord.from_dict(header['last_record']):
+                raise ValueError('the log has changed')
+        except FileNotFoundError:
+            return False
+        except (EOFError, IndexError, KeyError, StopIteration,
+                ValueError) as error:
+            logging.warning('Ignoring weather log snapshot (%s). '
+                            'Loading the full log', error or 'unreadable')
+            return False
+
+        # Re-read the last record, so the replay starts on a record boundary
+        del self.times[-1:]
+        self.index_log(self.offsets.pop())
+        self.snapshot_rollups = header['rollups']
+        logging.debug('Loaded %d records from the snapshot and replayed %d',
+                      count, len(self.times) - count)
+        return True
+
+    def capture_snapshot(self):
+        """Capture the state to save in a snapshot
+
+        This runs wherever records are appended, so that the index and
+        rollups are captured at a consistent point. Writing the snapshot
+        out is left to `write_snapshot()`.
+
+        Returns:
+            dict: The captured state, or ``None`` if there's nothing to
+                snapshot right now
+        """
+        count = len(self.offsets)
+        if count == 0 or self.rollups is None or self.rollups.pending:
+            return None
+        return {
+            'generation': self.generation,
+            'times': self.times[:count],
+            'offsets': self.offsets[:count],
+            'last_record': next(self.read_records(count - 1, count)).to_dict(),
+            'rollups': self.rollups.state()
+        }
+
+    def write_snapshot(self, snapshot):
+        """Atomically write out a snapshot captured by `capture_snapshot()`
+
+        The header is a line of JSON, followed by the time and offset
+        arrays as raw machine values.
+        """
+        if snapshot['generation'] != self.generation:
+            # The log was rewritten after the capture, so it's out of date
+            return
+        header = {
+            'inode': os.stat(self.log_path).st_ino,
+            'byteorder': sys.byteorder,
+            'count': len(snapshot['times']),
+            'last_record': snapshot['last_record'],
+            'rollups': snapshot['rollups']
+        }
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'wb') as snapshot_file:
+            snapshot_file.write(json.dumps(header).encode() + b'\n')
+            snapshot['times'].tofile(snapshot_file)
+            snapshot['offsets'].tofile(snapshot_file)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        logging.debug('Saved weather log snapshot of %d records',
+                      header['count'])
+
+    def iter_records(self):
+        """Iterate over every record in the log, oldest first"""
+        with open(self.log_path, 'rb') as log_file:
+            yield from map(WeatherRecord.from_dict, iter_json_array(log_file))
+
+    def range(self, start, end):
+        """Return a view of the records logged between two times
+
+        Args:
+            start (datetime): The earliest time to include
+            end (datetime): The time to stop at (exclusive)
+
+        Returns:
+            RecordView: The matching records, oldest first
+        """
+        return RecordView(
+            self,
+            bisect.bisect_left(self.times, start.timestamp()),
+            bisect.bisect_left(self.times, end.timestamp())
+        )
+
+    def latest(self, count):
+        """Return a view of the most recent records
+
+        Args:
+            count (int): The number of records to include
+
+        Returns:
+            RecordView: The matching records, oldest first
+        """
+        total = len(self.times)
+        return RecordView(self, max(0, total - count), total)
+
+    def count_records(self):
+        """Return the number of records in the log, from the index"""
+        return len(self.times)
+
+    def records_from(self, start):
+        """Return a view of the records from a position to the end"""
+        return RecordView(self, start, len(self.times))
+
+    def read_records(self, start, stop):
+        """Iterate over the records at a run of positions in the log
+
+        Records still held in memory are served from there. Older ones are
+        paged in from disk through the page cache. `trim_memory()` never
+        drops a record before it has been written, so every record that
+        has to be paged in has an offset in the index.
+
+        Args:
+            start (int): The position of the first record to read
+            stop (int): The position just past the last record to read
+        """
+        memory_start = len(self.times) - len(self.log_data)
+        position = start
+        while position < min(stop, memory_start):
+            page, first = divmod(position, self.PAGE_RECORDS)
+            last = min(stop, memory_start) - page * self.PAGE_RECORDS
+            records = self.read_page(page, min(last, self.PAGE_RECORDS))
+            yield from records[first:last]
+            position = (page + 1) * self.PAGE_RECORDS
+        start = max(start, memory_start)
+        if start < stop:
+            # Copy the slice out, so appends can't mutate it under our feet
+            yield from list(itertools.islice(self.log_data,
+                                             start - memory_start,
+                                             stop - memory_start))
+
+    def clear_caches(self):
+        """Drop the cached pages, after the log has been rewritten"""
+        self.page_cache.clear()
+
+    def read_page(self, page, needed):
+        """Return a page of records from disk, using the cache if possible
+
+        Args:
+            page (int): The number of the page
+            needed (int): How many records the page must hold. The newest
+                page may have been cached before it filled up.
+
+        Returns:
+            list: The page's records
+        """
+        records = self.page_cache.get(page)
+        if records is None or len(records) < needed:
+            first = page * self.PAGE_RECORDS
+            count = min(self.PAGE_RECORDS, len(self.offsets) - first)
+            with open(self.log_path, 'rb') as log_file:
+                records = list(itertools.islice(
+                    self.read_from(log_file, self.offsets[first]), count))
+            self.page_cache.put(page, records)
+        return records
+
+    def read_from(self, log_file, offset):
+        """Iterate over the records in the log file from an offset"""
+        return (WeatherRecord.from_dict(element)
+                for _, element in scan_json_array(log_file, offset))
+
+    def drop_records(self, before):
+        """Remove the records logged before a time from the log file
+
+        The file is rewritten from the first record that is kept, which
+        the index points straight to.
+        """
+        cut = min(bisect.bisect_left(self.times, before), len(self.offsets))
+        if cut == 0:
+            return 0
+        if cut < len(self.offsets):
+            start = self.offsets[cut]
+            rewrite_tail(self.log_path, start, b'[')
+            shift = start - 1
+        else:
+            with open(self.log_path, 'rb') as log_file:
+                start, _ = find_array_end(log_file)
+            rewrite_tail(self.log_path, start, b'[')
+            shift = 0
+        self.offsets = array.array(
+            'q', (offset - shift for offset in self.offsets[cut:])
+        )
+        del self.times[:cut]
+        return cut
+
+    def write_records(self, records):
+        """Append new records to the log file in place
+
+        Seek back over the closing bracket of the array and write the new
+        records, followed by a fresh closing bracket. The file stays a valid
+        JSON array, and the append costs the size of the records rather
+        than the size of the log.
+        """
+        try:
+            with open(self.log_path, 'r+b', buffering=0) as log_file:
+                position, empty = find_array_end(log_file)
+                text = ''
+                offsets = []
+                for record in records:
+                    if text or not empty:
+                        text += ','
+                    element = self.dumps(record.to_dict())
+                    if not self.compact:
+                        element = '\n' + textwrap.indent(element, ' ' * 4) + '\n'
+                    # Index the record where a scan of the file would find it
+                    offsets.append(position + len(text) + len(element)
+                                   - len(element.lstrip()))
+                    text += element
+                log_file.seek(position)
+                tail = log_file.read()
+                try:
+                    log_file.seek(position)
+                    write_fully(log_file, (text + ']').encode())
+                    log_file.truncate()
+                except OSError:
+                    # Put the end of the array back, so the batch can be
+                    # written again without leaving a partial copy behind
+                    log_file.seek(position)
+                    write_fully(log_file, tail)
+                    log_file.truncate()
+                    raise
+            self.offsets.extend(offsets)
+        except FileNotFoundError:
+            # If the file has gone missing, start it over from what we have
+            logging.warning('%s has gone missing. Rewriting it', self.log_path)
             self.write_log()
-            return True
-        return False
+            self.load_log()
+        except ValueError:
+            # Only the tail of the log is in memory, so don't write over a
+            # mangled file. Set it aside and start a new one.
+            logging.error('Could not append to %s. Moving it to %s.bak',
+                          self.log_path, self.log_path)
+            os.replace(self.log_path, self.log_path + '.bak')
+            self.write_log()
+            self.load_log()
+
+    def sync(self):
+        """Force everything written to the log file out to storage"""
+        with open(self.log_path, 'rb') as log_file:
+            os.fsync(log_file.fileno())
 
     def write_log(self):
         """Write the log to the specified file"""
         with open(self.log_path, 'w') as log_file:
-            json.dump(self.log_data, log_file, indent=4)
+            log_file.write(self.dumps([
+                record.to_dict() for record in self.log_data
+            ]))
+
+    def dumps(self, obj):
+        """Serialize records in the configured layout"""
+        if self.compact:
+            return json.dumps(obj, separators=(',', ':'))
+        return json.dumps(obj, indent=4)
+
+class JSONLinesLogger(WeatherLogger):
+    """Implements a JSON Lines logger for weather data
+
+    Each record is stored as one line of JSON, so appending a record
+    writes that line and nothing else, no matter how long the log has
+    grown. The log is loaded a line at a time on startup.
+    """
+    def index_log(self, start=None):
+        """Stream in the log from an offset, one line at a time
+
+        Args:
+            start (int): The offset of the first line to read, or ``None``
+                to read the whole log
+        """
+        good_length = start or 0
+        line, line_kept, read_any = b'\n', True, bool(start)
+        with open(self.log_path, 'rb') as log_file:
+            if not good_length and log_file.read(64).lstrip().startswith(b'['):
+                # Skipping every line of a JSON array log would leave
+                # nothing, then cut off its closing bracket
+                raise ValueError(
+                    '{} is a JSON array log, not JSON Lines. Set data_format '
+                    'to "json" or point data_file at a new log'.format(
+                        self.log_path))
+            log_file.seek(good_length)
+            for line_number, line in enumerate(log_file, 1):
+                line_kept = True
+                if line.strip():
+                    try:
+                        record = WeatherRecord.from_dict(json.loads(line))
+                        self.log_data.append(record)
+                        self.times.append(record.time)
+                        self.offsets.append(good_length)
+                        self.trim_memory()
+                        read_any = True
+                    except (KeyError, TypeError, ValueError):
+                        logging.warning('Skipping unreadable record on line %d of %s',
+                                        line_number, self.log_path)
+                        line_kept = False
+                        if not line.endswith(b'\n'):
+                            # Leave a partial last line for the repair below
+                            continue
+                good_length += len(line)
+        if not line.endswith(b'\n'):
+            # A power cut mid-write can leave the last line unterminated. Make
+            # sure the next record starts on a line of its own, dropping the
+            # partial record if it couldn't be read. If no record could be
+            # read at all, this may not be a log we understand, so keep it.
+            logging.warning('Repairing unterminated last line of %s',
+                            self.log_path)
+            with open(self.log_path, 'r+b') as log_file:
+                if line_kept or not read_any:
+                    log_file.seek(0, os.SEEK_END)
+                    log_file.write(b'\n')
+                else:
+                    log_file.truncate(good_length)
+
+    def iter_records(self):
+        """Iterate over every record in the log, oldest first"""
+        with open(self.log_path, 'rb') as log_file:
+            yield from iter_record_lines(log_file)
+
+    def read_from(self, log_file, offset):
+        """Iterate over the records in the log file from an offset"""
+        log_file.seek(offset)
+        return iter_record_lines(log_file)
+
+    def drop_records(self, before):
+        """Remove the records logged before a time from the log file"""
+        cut = min(bisect.bisect_left(self.times, before), len(self.offsets))
+        if cut == 0:
+            return 0
+        if cut < len(self.offsets):
+            start = self.offsets[cut]
+        else:
+            start = os.path.getsize(self.log_path)
+        rewrite_tail(self.log_path, start)
+        self.offsets = array.array(
+            'q', (offset - start for offset in self.offsets[cut:])
+        )
+        del self.times[:cut]
+        return cut
+
+    def write_records(self, records):
+        """Append new records to the log file, one line each"""
+        lines = [
+            (json.dumps(record.to_dict()) + '\n').encode() for record in records
+        ]
+        position = append_fully(self.log_path, b''.join(lines))
+        for line in lines:
+            self.offsets.append(position)
+            position += len(line)
+
+    def write_log(self):
+        """Write the whole log to the specified file, one record per line"""
+        with open(self.log_path, 'w') as log_file:
+            for record in self.log_data:
+                log_file.write(json.dumps(record.to_dict()) + '\n')
+
+class SQLiteLogger(WeatherStore):
+    """Implements a SQLite logger for weather data
+
+    Records live in a single table indexed on time, so appending a record
+    is a one-row insert and finding the last record is an index lookup,
+    however long the history grows. The database runs in write-ahead
+    logging mode, so readers like the dashboard can query it while the
+    station is writing. Times are stored as UTC epoch seconds, just as
+    records hold them.
+    """
+    def __init__(self, path, **options):
+        self.connection = None
+        super().__init__(path, **options)
+
+    def load_log(self):
+        """Open the database, creating its table and index if needed"""
+        # Writes may come from a LogWriter thread, so the connection is
+        # shared between threads and guarded by a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.log_path,
+                                          check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # Leave syncing to `sync()`, so a LogWriter can batch it
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS weather '
+            '(time REAL NOT NULL, temp REAL, humidity REAL)'
+        )
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS weather_time ON weather (time)'
+        )
+        self.connection.commit()
+
+        self.log_data = self.new_log_data()
+        self.log_data.extend(
+            self.query('SELECT time, temp, humidity FROM weather '
+                       'ORDER BY time DESC LIMIT 1')
+        )
+
+    def new_log_data(self):
+        """Return an empty deque to hold the last record, for `last_record`"""
+        return collections.deque(maxlen=1)
+
+    def query(self, sql, parameters=()):
+        """Run a query against the log and return the matching records"""
+        with self.lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+        return [WeatherRecord(*row) for row in rows]
+
+    def range(self, start, end):
+        """Return the records logged between two times
+
+        Args:
+            start (datetime): The earliest time to include
+            end (datetime): The time to stop at (exclusive)
+
+        Returns:
+            list: The matching records, oldest first
+        """
+        return self.query(
+            'SELECT time, temp, humidity FROM weather '
+            'WHERE time >= ? AND time < ? ORDER BY time',
+            (start.timestamp(), end.timestamp())
+        )
+
+    def latest(self, count):
+        """Return the most recent records
+
+        Args:
+            count (int): The number of records to include
+
+        Returns:
+            list: The matching records, oldest first
+        """
+        return self.query(
+            'SELECT * FROM (SELECT time, temp, humidity FROM weather '
+            'ORDER BY time DESC LIMIT ?) ORDER BY time',
+            (count,)
+        )
+
+    def count_records(self):
+        """Return the number of records in the log"""
+        with self.lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM weather'
+            ).fetchone()[0]
+
+    def records_from(self, start):
+        """Return the records from a position in the log to the end
+
+        Returns:
+            list: The matching records, oldest first
+        """
+        return self.query(
+            'SELECT time, temp, humidity FROM weather ORDER BY time '
+            'LIMIT -1 OFFSET ?',
+            (start,)
+        )
+
+    def select(self, start, end, min_temp=None, max_temp=None,
+               min_humidity=None, max_humidity=None):
+        """Return the records between two times with readings in bounds
+
+        The bounds are checked by the database, as it scans the time index.
+        """
+        sql = ('SELECT time, temp, humidity FROM weather '
+               'WHERE time >= ? AND time < ?')
+        parameters = [start.timestamp(), end.timestamp()]
+        for condition, value in (('temp >= ?', min_temp),
+                                 ('temp <= ?', max_temp),
+                                 ('humidity >= ?', min_humidity),
+                                 ('humidity <= ?', max_humidity)):
+            if value is not None:
+                sql += ' AND ' + condition
+                parameters.append(value)
+        return self.query(sql + ' ORDER BY time', parameters)
+
+    def iter_records(self, batch_size=1000):
+        """Iterate over every record in the log, oldest first
+
+        Records are fetched in batches, so the lock is never held while the
+        caller works through them.
+        """
+        last_rowid = 0
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    'SELECT rowid, time, temp, humidity FROM weather '
+                    'WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                    (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for (last_rowid, *fields) in rows:
+                yield WeatherRecord(*fields)
+
+    def write_records(self, records):
+        """Insert new records into the database in one transaction"""
+        with self.lock:
+            try:
+                self.connection.executemany(
+                    'INSERT INTO weather (time, temp, humidity) '
+                    'VALUES (?, ?, ?)',
+                    [
+                        (record.time, record.temp, record.humidity)
+                        for record in records
+                    ]
+                )
+                self.connection.commit()
+            except sqlite3.Error:
+                # Don't leave part of the batch to be committed with the next
+                self.connection.rollback()
+                raise
+
+    def drop_records(self, before, batch_size=1000):
+        """Delete the records logged before a time
+
+        Records are deleted in batches, so queries aren't held up behind
+        one long transaction. SQLite reuses the freed pages for new rows.
+        """
+        count = 0
+        while True:
+            with self.lock:
+                deleted = self.connection.execute(
+                    'DELETE FROM weather WHERE rowid IN '
+                    '(SELECT rowid FROM weather WHERE time < ? LIMIT ?)',
+                    (before, batch_size)
+                ).rowcount
+                self.connection.commit()
+            count += deleted
+            if deleted < batch_size:
+                return count
+
+    def sync(self):
+        """Checkpoint the write-ahead log, forcing it out to storage"""
+        with self.lock:
+            self.connection.execute('PRAGMA wal_checkpoint(FULL)')
+
+    def write_log(self):
+        """Write the in-memory records to the database"""
+        self.write_records(list(self.log_data))
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.connection.close()
+
+class SegmentedLogger(WeatherStore):
+    """Implements a logger that splits weather data into time segments
+
+    The data file path names a directory holding one JSON Lines segment
+    per day or month, plus a small manifest listing each segment with
+    its first and last time and record count. Only the newest segment is
+    loaded on startup, so startup time and memory stay bounded however
+    many years of history the directory holds. Older segments are read
+    on demand by `range()`.
+
+    Each manifest entry doubles as a zone map for its segment, with the
+    lowest and highest temperature and humidity alongside the times and
+    count. `select()` checks them to skip every segment that can't hold
+    a matching record without opening it. Entries from manifests written
+    before zone maps existed are always scanned.
+
+    Closed segments are streamed from disk whenever they're read, and
+    queries filter records as they go, so none is ever held whole in
+    memory, however long its period.
+
+    Once a segment is closed, it can be compressed with gzip or lzma.
+    Compressed segments are decompressed a block at a time as they are
+    read, so reading one never inflates the whole file in memory. Closed
+    segments can instead be packed with the Gorilla codec, which is
+    decoded a segment at a time and keeps times to the microsecond, like
+    the segments themselves. It pays off when samples are only a minute
+    or two apart, so most readings repeat the one before, but at the
+    half-hourly ``sampling_period`` nearly every reading changes and gzip
+    packs them tighter. ``benchmark.py codecs -p PERIOD`` compares them
+    for any period.
+
+    Args:
+        path (str): The directory to keep segments in
+        segment_period (str): Either ``'day'`` or ``'month'``
+        compression (str): One of ``'gzip'``, ``'lzma'`` or ``'gorilla'``
+            to compress closed segments, or ``None`` to leave them as
+            they are
+        options: The options every `WeatherStore` takes. The newest
+            segment is always held in memory whole, so `memory_records`
+            and `memory_bytes` are ignored.
+    """
+    MANIFEST_NAME = 'manifest.json'
+
+    def __init__(self, path, segment_period='day', compression=None,
+                 **options):
+        if segment_period not in SEGMENT_NAME_FORMATS:
+            logging.error('Invalid segment period \'%s\'. Using days',
+                          segment_period)
+            segment_period = 'day'
+        if compression is not None and compression not in SEGMENT_COMPRESSION:
+            logging.error('Invalid segment compression \'%s\'. '
+                          'Leaving segments uncompressed', compression)
+            compression = None
+        self.segment_period = segment_period
+        self.compression = compression
+        self.manifest = []
+        self.segment = None
+        # The time of the last record written since startup
+        self.written_time = None
+        super().__init__(path, **options)
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a logger from the station config dict"""
+        return cls(
+            config['data_file'],
+            segment_period=config.get('segment_period', 'day'),
+            compression=config.get('segment_compression')
+        )
+
+    @property
+    def manifest_path(self):
+        """Return the path to the segment manifest"""
+        return os.path.join(self.log_path, self.MANIFEST_NAME)
+
+    def segment_name(self, record):
+        """Return the name of the segment a record belongs in"""
+        return record.datetime.strftime(SEGMENT_NAME_FORMATS[self.segment_period])
+
+    def load_log(self):
+        """Read the manifest and load the newest segment"""
+        os.makedirs(self.log_path, exist_ok=True)
+        try:
+            with open(self.manifest_path) as manifest_file:
+                self.manifest = json.load(manifest_file)['segments']
+        except FileNotFoundError:
+            self.rebuild_manifest()
+
+        if self.manifest:
+            self.segment = self.open_segment(self.manifest[-1]['file'],
+                                             memory_records=None)
+            self.log_data = self.segment.log_data
+            if self.log_data:
+                # The newest entry is only written out when its segment is
+                # started, so bring its stats up to date
+                self.manifest[-1] = segment_entry(self.manifest[-1]['file'],
+                                                  self.log_data)
+        else:
+            self.segment = None
+            self.log_data = collections.deque()
+
+    def open_segment(self, name, memory_records=0):
+        """Open a segment for writing"""
+        return JSONLinesLogger(os.path.join(self.log_path, name),
+                               memory_records=memory_records,
+                               keep_rollups=False)
+
+    def iter_segment_file(self, name):
+        """Iterate over the records in a segment file, decompressing them"""
+        path = os.path.join(self.log_path, name)
+        opener = open
+        for extension, compressed_opener in SEGMENT_COMPRESSION.values():
+            if name.endswith(extension):
+                opener = compressed_opener
+        if opener is None:
+            # Gorilla segments are small, so they're read in one go, then
+            # decoded a sample at a time
+            with open(path, 'rb') as segment_file:
+                samples = gorilla.decode(segment_file.read())
+            yield from (WeatherRecord(*sample) for sample in samples)
+            return
+        with opener(path, 'rb') as segment_file:
+            yield from iter_record_lines(segment_file)
+
+    def iter_segment(self, entry):
+        """Iterate over the records in a segment, oldest first"""
+        if entry is self.manifest[-1]:
+            # The newest segment is already in memory, unless the first
+            # record of a new one is still waiting to be written
+            log_data = self.log_data
+            if (not log_data
+                    or self.segment_name(log_data[0]) == entry['file']):
+                yield from list(log_data)
+                return
+        yield from self.iter_segment_file(entry['file'])
+
+    def iter_records(self):
+        """Iterate over every record in the log, oldest first"""
+        for entry in list(self.manifest):
+            yield from self.iter_segment(entry)
+
+    def rebuild_manifest(self):
+        """Recreate a missing manifest by scanning the segment files"""
+        self.manifest = []
+        extensions = tuple(
+            '.jsonl' + extension
+            for extension, _ in SEGMENT_COMPRESSION.values()
+        )
+        names = set(os.listdir(self.log_path))
+        segment_files = sorted(
+            name for name in names
+            if name.endswith(extensions)
+            # Skip a segment left behind after its compressed copy was made
+            or (name.endswith('.jsonl')
+                and not any(name + extension in names
+                            for extension, _ in SEGMENT_COMPRESSION.values()))
+        )
+        if segment_files:
+            logging.warning('Segment manifest missing. Rebuilding from %d files',
+                            len(segment_files))
+        for name in segment_files:
+            records = list(self.iter_segment_file(name))
+            if records:
+                self.manifest.append(segment_entry(name, records))
+        self.write_log()
+
+    def remember_record(self, record):
+        """Keep a new record in memory, dropping the last segment's records"""
+        if (self.log_data
+                and self.segment_name(self.log_data[-1]) != self.segment_name(record)):
+            self.log_data = collections.deque()
+        self.log_data.append(record)
+
+    def write_records(self, records):
+        """Append new records to their segments, starting one if it's due
+
+        A batch that spans two segments is written in two parts. If the
+        second fails, the records already written are skipped when the
+        batch is written again.
+        """
+        batch = []
+        for record in records:
+            if self.written_time is not None and record.time <= self.written_time:
+                continue
+            name = self.segment_name(record)
+            if (self.segment is None
+                    or os.path.basename(self.segment.log_path) != name):
+                if batch:
+                    self.write_segment(batch)
+                    batch = []
+                self.start_segment(name, record)
+            batch.append(record)
+        if batch:
+            self.write_segment(batch)
+
+    def write_segment(self, batch):
+        """Append records to the current segment, then to its manifest entry"""
+        self.segment.write_records(batch)
+        entry = self.manifest[-1]
+        for record in batch:
+            entry['end'] = record.datetime.isoformat()
+            entry['count'] += 1
+            update_zone(entry, record)
+        self.written_time = batch[-1].time
+
+    def drop_records(self, before):
+        """Delete the segments that end before a time
+
+        Segments are dropped whole, so records are kept until everything
+        in their segment has expired. The current segment is never dropped.
+        """
+        expired = [
+            entry for entry in self.manifest[:-1]
+            if dt.datetime.fromisoformat(entry['end']).timestamp() < before
+        ]
+        if not expired:
+            return 0
+        self.manifest = self.manifest[len(expired):]
+        self.write_log()
+        for entry in expired:
+            try:
+                os.remove(os.path.join(self.log_path, entry['file']))
+            except FileNotFoundError:
+                pass
+        return sum(entry['count'] for entry in expired)
+
+    def sync(self):
+        """Force everything written to the current segment out to storage"""
+        if self.segment is not None:
+            self.segment.sync()
+
+    def start_segment(self, name, record):
+        """Start a new segment and add it to the manifest"""
+        if self.compression is not None:
+            for entry in self.manifest:
+                if entry['file'].endswith('.jsonl'):
+                    self.compress_segment(entry)
+        self.manifest.append({
+            'file': name,
+            'start': record.datetime.isoformat(),
+            'end': record.datetime.isoformat(),
+            'count': 0,
+            'temp': None,
+            'humidity': None
+        })
+        self.segment = self.open_segment(name)
+        self.write_log()
+        logging.debug('Started weather log segment %s', name)
+
+    def compress_segment(self, entry):
+        """Compress a closed segment, replacing it in the manifest
+
+        The compressed copy is complete before the manifest points to it,
+        and the original is only removed after that, so a crash partway
+        through leaves at least one readable copy.
+        """
+        extension, opener = SEGMENT_COMPRESSION[self.compression]
+        path = os.path.join(self.log_path, entry['file'])
+        temp_path = path + extension + '.tmp'
+        try:
+            if opener is None:
+                packed = gorilla.encode(
+                    (record.time, record.temp, record.humidity)
+                    for record in self.iter_segment_file(entry['file'])
+                )
+                with open(temp_path, 'wb') as target:
+                    target.write(packed)
+            else:
+                with open(path, 'rb') as source, \
+                        opener(temp_path, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+            with open(temp_path, 'rb') as target:
+                os.fsync(target.fileno())
+        except FileNotFoundError:
+            logging.warning('Segment %s has gone missing', entry['file'])
+            return
+        os.replace(temp_path, path + extension)
+        entry['file'] += extension
+        self.write_log()
+        os.remove(path)
+        logging.debug('Compressed weather log segment %s', entry['file'])
+
+    def write_log(self):
+        """Write the segment manifest"""
+        write_json_atomic(self.manifest_path, {
+            'period': self.segment_period,
+            'segments': self.manifest
+        })
+
+    def range(self, start, end):
+        """Return the records logged between two times
+
+        Only the segments overlapping the requested times are read.
+
+        Args:
+            start (datetime): The earliest time to include
+            end (datetime): The time to stop at (exclusive)
+
+        Returns:
+            list: The matching records, oldest first
+        """
+        return self.select(start, end)
+
+    def select(self, start, end, min_temp=None, max_temp=None,
+               min_humidity=None, max_humidity=None):
+        """Return the records between two times with readings in bounds
+
+        Segments whose times or zone maps rule them out are skipped
+        without being opened. The rest are filtered as they're read, and
+        left as soon as they pass the end time.
+        """
+        start_time, end_time = start.timestamp(), end.timestamp()
+        records = []
+        for entry in list(self.manifest):
+            if entry is not self.manifest[-1] and (
+                    dt.datetime.fromisoformat(entry['end']) < start
+                    or dt.datetime.fromisoformat(entry['start']) >= end
+                    or not entry_overlaps(entry, 'temp', min_temp, max_temp)
+                    or not entry_overlaps(entry, 'humidity',
+                                          min_humidity, max_humidity)):
+                continue
+            for record in self.iter_segment(entry):
+                if record.time >= end_time:
+                    break
+                if (record.time >= start_time
+                        and in_bounds(record.temp, min_temp, max_temp)
+                        and in_bounds(record.humidity,
+                                      min_humidity, max_humidity)):
+                    records.append(record)
+        return records
+
+    def latest(self, count):
+        """Return the most recent records
+
+        Segments are read newest first, until there are enough records,
+        keeping only as many of each segment's last records as are still
+        needed.
+
+        Args:
+            count (int): The number of records to include
+
+        Returns:
+            list: The matching records, oldest first
+        """
+        records = []
+        for entry in reversed(list(self.manifest)):
+            needed = count - len(records)
+            if needed <= 0:
+                break
+            records[:0] = collections.deque(self.iter_segment(entry),
+                                            maxlen=needed)
+        return records
+
+    def count_records(self):
+        """Return the number of records in the log, from the manifest"""
+        manifest = list(self.manifest)
+        if not manifest:
+            return 0
+        # The newest segment's count only covers what has been written
+        return (sum(entry['count'] for entry in manifest[:-1])
+                + sum(1 for _ in self.iter_segment(manifest[-1])))
+
+    def records_from(self, start):
+        """Return the records from a position in the log to the end
+
+        Whole segments before the position are skipped by their counts in
+        the manifest, without being opened.
+
+        Returns:
+            list: The matching records, oldest first
+        """
+        records = []
+        manifest = list(self.manifest)
+        for entry in manifest:
+            if entry is not manifest[-1] and start >= entry['count']:
+                start -= entry['count']
+                continue
+            records.extend(itertools.islice(self.iter_segment(entry),
+                                            start, None))
+            start = 0
+        return records
+
+class BinaryLogger(WeatherStore):
+    """Implements a fixed-width binary logger for long-term archives
+
+    Each record is packed as epoch seconds (int64) followed by temp and
+    humidity, either as hundredths in int16s (12 bytes per record) or as
+    float32s (16 bytes per record), after a short header naming the
+    encoding. Records are read back through `mmap`, so scans and range
+    lookups unpack straight from the page cache without copying the file
+    into memory. Only the last record is held in memory.
+
+    Args:
+        path (str): The path to the binary data file
+        encoding (str): Either ``'scaled'`` or ``'float'``. Existing files
+            keep the encoding they were created with.
+        options: The options every `WeatherStore` takes. Only the last
+            record is held in memory, so `memory_records` and
+            `memory_bytes` are ignored.
+    """
+    HEADER = struct.Struct('<7sc')
+    MAGIC = b'WETSPEC'
+    ENCODINGS = {
+        'scaled': struct.Struct('<qhh'),
+        'float': struct.Struct('<qff')
+    }
+    # Marks a missing reading in the scaled encoding
+    SCALED_NULL = -32768
+
+    def __init__(self, path, encoding='scaled', **options):
+        if encoding not in self.ENCODINGS:
+            logging.error('Invalid binary encoding \'%s\'. Using scaled',
+                          encoding)
+            encoding = 'scaled'
+        self.encoding = encoding
+        super().__init__(path, **options)
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a logger from the station config dict"""
+        return cls(
+            config['data_file'],
+            encoding=config.get('binary_encoding', 'scaled')
+        )
+
+    def new_log_data(self):
+        """Return an empty deque to hold the last record, for `last_record`"""
+        return collections.deque(maxlen=1)
+
+    @property
+    def record_struct(self):
+        """Return the struct used to pack records in this file"""
+        return self.ENCODINGS[self.encoding]
+
+    def load_log(self):
+        """Read the file header and the last record"""
+        with open(self.log_path, 'r+b') as log_file:
+            magic, code = self.HEADER.unpack(log_file.read(self.HEADER.size))
+            if magic != self.MAGIC:
+                raise ValueError('{} is not a binary weather log'.format(
+                    self.log_path))
+            self.encoding = 'scaled' if code == b's' else 'float'
+
+            # Cut off any partial record left by an interrupted write
+            size = log_file.seek(0, os.SEEK_END)
+            excess = (size - self.HEADER.size) % self.record_struct.size
+            if excess:
+                logging.warning('Truncating partial record at the end of %s',
+                                self.log_path)
+                size -= excess
+                log_file.truncate(size)
+
+            self.log_data = self.new_log_data()
+            if size > self.HEADER.size:
+                log_file.seek(size - self.record_struct.size)
+                self.log_data.append(
+                    self.unpack(log_file.read(self.record_struct.size))
+                )
+
+    def pack(self, record):
+        """Pack a record into its fixed-width binary form"""
+        timestamp = int(record.time)
+        values = (record.temp, record.humidity)
+        if self.encoding == 'scaled':
+            values = tuple(
+                self.SCALED_NULL if value is None or math.isnan(value)
+                else max(-32767, min(32767, round(value * 100)))
+                for value in values
+            )
+        else:
+            values = tuple(
+                math.nan if value is None else value for value in values
+            )
+        return self.record_struct.pack(timestamp, *values)
+
+    def unpack(self, buffer, offset=0):
+        """Unpack a binary record"""
+        return self.to_record(self.record_struct.unpack_from(buffer, offset))
+
+    def to_record(self, fields):
+        """Convert unpacked binary fields into a record"""
+        timestamp, temp, humidity = fields
+        if self.encoding == 'scaled':
+            temp, humidity = (
+                None if value == self.SCALED_NULL else value / 100
+                for value in (temp, humidity)
+            )
+        else:
+            temp, humidity = (
+                None if math.isnan(value) else value
+                for value in (temp, humidity)
+            )
+        return WeatherRecord(float(timestamp), temp, humidity)
+
+    def iter_records(self):
+        """Iterate over every record in the log, oldest first
+
+        The records are unpacked directly from a memory map of the file.
+        """
+        with self.map_log() as mapped:
+            # Leave out any record that is still being written
+            count = self.record_count(mapped)
+            view = memoryview(mapped)[
+                self.HEADER.size:self.HEADER.size + count * self.record_struct.size
+            ]
+            try:
+                for fields in self.record_struct.iter_unpack(view):
+                    yield self.to_record(fields)
+            finally:
+                view.release()
+
+    def record_count(self, mapped):
+        """Return the number of whole records in a mapped log file"""
+        return (len(mapped) - self.HEADER.size) // self.record_struct.size
+
+    def map_log(self):
+        """Return a read-only memory map of the log file"""
+        with open(self.log_path, 'rb') as log_file:
+            return mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def range(self, start, end):
+        """Return a view of the records logged between two times
+
+        The records are fixed-width and sorted by time, so the bounds are
+        found by binary search over the memory-mapped file.
+
+        Args:
+            start (datetime): The earliest time to include
+            end (datetime): The time to stop at (exclusive)
+
+        Returns:
+            RecordView: The matching records, oldest first
+        """
+        with self.map_log() as mapped:
+            return RecordView(self, self.search(mapped, start.timestamp()),
+                              self.search(mapped, end.timestamp()))
+
+    def search(self, mapped, time):
+        """Find the index of the first mapped record at or after a time"""
+        record_size = self.record_struct.size
+        low, high = 0, self.record_count(mapped)
+        while low < high:
+            middle = (low + high) // 2
+            (timestamp,) = struct.unpack_from(
+                '<q', mapped, self.HEADER.size + middle * record_size
+            )
+            if timestamp < time:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def drop_records(self, before):
+        """Remove the records logged before a time from the log file"""
+        with self.map_log() as mapped:
+            cut = self.search(mapped, before)
+            header = mapped[:self.HEADER.size]
+        if cut == 0:
+            return 0
+        rewrite_tail(self.log_path,
+                     self.HEADER.size + cut * self.record_struct.size, header)
+        return cut
+
+    def latest(self, count):
+        """Return a view of the most recent records
+
+        Args:
+            count (int): The number of records to include
+
+        Returns:
+            RecordView: The matching records, oldest first
+        """
+        with self.map_log() as mapped:
+            total = self.record_count(mapped)
+        return RecordView(self, max(0, total - count), total)
+
+    def count_records(self):
+        """Return the number of records in the log"""
+        with self.map_log() as mapped:
+            return self.record_count(mapped)
+
+    def records_from(self, start):
+        """Return a view of the records from a position to the end"""
+        return RecordView(self, start, self.count_records())
+
+    def read_records(self, start, stop):
+        """Iterate over the records at a run of positions in the log"""
+        record_size = self.record_struct.size
+        with self.map_log() as mapped:
+            records = [
+                self.unpack(mapped, self.HEADER.size + index * record_size)
+                for index in range(start, min(stop, self.record_count(mapped)))
+            ]
+        yield from records
+
+    def write_records(self, records):
+        """Append new packed records to the log file"""
+        append_fully(self.log_path,
+                     b''.join(self.pack(record) for record in records))
+
+    def sync(self):
+        """Force everything written to the log file out to storage"""
+        with open(self.log_path, 'rb') as log_file:
+            os.fsync(log_file.fileno())
+
+    def write_log(self):
+        """Write the file header and any in-memory records"""
+        code = b's' if self.encoding == 'scaled' else b'f'
+        with open(self.log_path, 'wb') as log_file:
+            log_file.write(self.HEADER.pack(self.MAGIC, code))
+            for record in self.log_data:
+                log_file.write(self.pack(record))
+
+class LogWriter:
+    """Persists weather records without blocking the event loop
+
+    New records go into the logger's memory straight away, so
+    `last_record` is always current, and are then queued for a single
+    worker thread that does the disk I/O. The queue is bounded, so if
+    the SD card stalls for long enough `append` waits for room rather
+    than letting the backlog grow without limit.
+
+    Pending records are written and synced to storage together, as often
+    as the sync policy asks:
+
+    * ``'every-record'``: as soon as each record arrives
+    * ``'every-n-records'``: once ``sync_records`` records are pending
+    * ``'every-t-seconds'``: once the oldest pending record is
+      ``sync_seconds`` old
+    * ``'on-shutdown'``: only when the writer is flushed or stopped
+
+    Batching saves SD card write cycles, at the cost of losing whatever
+    is still pending if the power goes out. The logger's latest reading
+    file is brought up to date only once a batch is synced, so it never
+    names a record the log doesn't hold, and under ``'on-shutdown'`` it
+    isn't written until the writer stops.
+
+    Loggers write a batch all or nothing, so if a write fails, its records
+    stay pending, ahead of any newer ones, and are written again after
+    ``retry_seconds``. That keeps the logger's index in step with what is
+    on disk. Records that still can't be written when the writer stops
+    are lost.
+
+    Args:
+        logger (WeatherStore): The logger to write records through
+        sync_policy (str): One of the ``SYNC_POLICIES`` above
+        sync_records (int): The batch size for ``'every-n-records'``
+        sync_seconds (float): The batch age for ``'every-t-seconds'``
+        max_pending (int): The most records to queue before `append` waits
+        retry_seconds (float): How long to wait before writing a failed
+            batch again
+    """
+    SYNC_POLICIES = ('every-record', 'every-n-records', 'every-t-seconds',
+                     'on-shutdown')
+
+    def __init__(self, logger, sync_policy='every-record', sync_records=16,
+                 sync_seconds=600, max_pending=64, retry_seconds=60):
+        if sync_policy not in self.SYNC_POLICIES:
+            logging.error('Invalid sync policy \'%s\'. Syncing every record',
+                          sync_policy)
+            sync_policy = 'every-record'
+        self.logger = logger
+        self.sync_policy = sync_policy
+        self.sync_records = sync_records
+        self.sync_seconds = sync_seconds
+        self.max_pending = max_pending
+        self.retry_seconds = retry_seconds
+        self.pending = []
+        self.pending_since = None
+        # The sequence number of the newest pending record
+        self.pending_sequence = None
+        self.retry_at = None
+        self.queue = None
+        self.task = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    @classmethod
+    def from_config(cls, logger, config):
+        """Create a writer from the station config dict"""
+        return cls(
+            logger,
+            sync_policy=config.get('fsync_policy', 'every-record'),
+            sync_records=config.get('fsync_records', 16),
+            sync_seconds=config.get('fsync_seconds', 600)
+        )
+
+    async def start(self):
+        """Start the writer task"""
+        # Create the queue here so it belongs to the running event loop
+        self.queue = asyncio.Queue(self.max_pending)
+        self.task = asyncio.create_task(self.run())
+        logging.info('Started weather log writer (%s)', self.sync_policy)
+
+    async def append(self, temp, humidity, interval):
+        """Append a record to the weather log, writing it in the background
+
+        Returns:
+            bool: ``True`` if a record was due and has been queued
+        """
+        record = self.logger.new_record(temp, humidity, interval)
+        if record is None:
+            return False
+        await self.add_record(record)
+        return True
+
+    async def add_record(self, record):
+        """Add a new record to the logger's memory and queue it to be written"""
+        self.logger.remember_record(record)
+        self.logger.track_record(record)
+        await self.queue.put((record, self.logger.sequence))
+
+    @property
+    def sync_due(self):
+        """Returns ``True`` if the pending records should be synced now"""
+        if not self.pending:
+            return False
+        if self.retry_at is not None:
+            # A write failed, so hold off whatever the policy says
+            return asyncio.get_running_loop().time() >= self.retry_at
+        if self.sync_policy == 'every-record':
+            return True
+        if self.sync_policy == 'every-n-records':
+            return len(self.pending) >= self.sync_records
+        if self.sync_policy == 'every-t-seconds':
+            return self.pending_age >= self.sync_seconds
+        return False
+
+    @property
+    def pending_age(self):
+        """Returns how long the oldest pending record has been waiting"""
+        return asyncio.get_running_loop().time() - self.pending_since
+
+    async def run(self):
+        """Collect queued records and sync them as the policy requires"""
+        loop = asyncio.get_running_loop()
+        while True:
+            timeout = None
+            if self.pending and self.retry_at is not None:
+                timeout = max(0, self.retry_at - loop.time())
+            elif self.pending and self.sync_policy == 'every-t-seconds':
+                timeout = max(0, self.sync_seconds - self.pending_age)
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                self.queue.task_done()
+                if item is None:
+                    # `stop()` has asked us to finish up
+                    await self.flush()
+                    if self.pending:
+                        logging.error('Lost %d weather records that could '
+                                      'not be written', len(self.pending))
+                    return
+                if not self.pending:
+                    self.pending_since = loop.time()
+                record, self.pending_sequence = item
+                self.pending.append(record)
+            if self.sync_due:
+                await self.flush()
+
+    async def flush(self):
+        """Write and sync all pending records in a single batch"""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        sequence = self.pending_sequence
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor,
+                                       self.logger.write_records, batch)
+        except Exception: #pylint: disable=broad-except
+            # None of the batch was written, so keep it, ahead of any newer
+            # records, to try again later
+            self.pending[:0] = batch
+            self.retry_at = loop.time() + self.retry_seconds
+            logging.exception('Failed to write %d weather records. '
+                              'Retrying in %s s', len(batch),
+                              self.retry_seconds)
+            return
+        self.retry_at = None
+        try:
+            await loop.run_in_executor(self.executor, self.sync_batch,
+                                       batch, sequence)
+        except Exception: #pylint: disable=broad-except
+            # The records are in the log, so don't write them again
+            logging.exception('Failed to sync %d weather records', len(batch))
+
+    async def run_in_worker(self, function, *args):
+        """Run a function on the writer's worker thread, after queued writes
+
+        Anything else that rewrites the log goes through here, so it never
+        runs at the same time as a batch of writes.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, function, *args
+        )
+
+    async def since(self, cursor):
+        """Return the records logged after a cursor
+
+        The log is read on the worker thread, so the read never stalls the
+        event loop and never sees a batch or an expiry half done.
+
+        Args:
+            cursor (int): The sequence number of the last record already
+                seen, or 0 to fetch the whole log
+
+        Returns:
+            tuple: The new records, oldest first, and the cursor to pass
+                next time
+        """
+        return await self.run_in_worker(self.read_since, cursor)
+
+    def read_since(self, cursor):
+        """Read the records logged after a cursor into a list
+
+        Some loggers return a lazy view, which has to be read here on the
+        worker thread too, before the next batch of writes can move it.
+        """
+        records, cursor = self.logger.since(cursor)
+        return list(records), cursor
+
+    def sync_batch(self, batch, sequence):
+        """Sync a batch of records just written, then update the sidecars
+
+        Args:
+            batch (list): The records written
+            sequence (int): The sequence number of the last of them
+        """
+        self.logger.sync()
+        self.logger.write_sidecars(batch[-1], sequence)
+        logging.debug('Wrote and synced %d weather records', len(batch))
+
+    async def stop(self):
+        """Write out everything pending and stop the writer"""
+        # Cancelling the task could cancel a batch before the worker thread
+        # picks it up, so queue a marker that tells it to finish instead
+        await self.queue.put(None)
+        await self.task
+        self.executor.shutdown()
+        logging.info('Stopped weather log writer')
+
+class Compactor:
+    """Expires old raw records in the background
+
+    Once every `interval` seconds, records older than the retention
+    window are dropped from the log, leaving its hourly rollups as the
+    record of that time. The work runs on the log writer's worker thread,
+    so it never blocks the station loop or overlaps a write, and each
+    pass only has the records that expired since the last one to drop.
+
+    Args:
+        writer (LogWriter): The writer for the log to compact
+        retention_days (float): How long to keep raw records, or ``None``
+            to keep them forever
+        interval (float): The time between passes, in seconds
+    """
+    def __init__(self, writer, retention_days=None, interval=3600):
+        self.writer = writer
+        self.retention_days = retention_days
+        self.interval = interval
+        self.task = None
+
+    @classmethod
+    def from_config(cls, writer, config):
+        """Create a compactor from the station config dict"""
+        return cls(
+            writer,
+            retention_days=config.get('retention_days'),
+            interval=config.get('compaction_interval', 3600)
+        )
+
+    async def start(self):
+        """Start compacting, if there's a retention window"""
+        if self.retention_days is None:
+            return
+        self.task = asyncio.create_task(self.run())
+        logging.info('Keeping raw weather records for %s days',
+                     self.retention_days)
+
+    async def run(self):
+        """Compact the log, then wait for the next pass"""
+        while True:
+            cutoff = (dt.datetime.now(dt.timezone.utc).timestamp()
+                      - self.retention_days * 86400)
+            try:
+                await self.writer.run_in_worker(
+                    self.writer.logger.expire_records, cutoff
+                )
+            except Exception: #pylint: disable=broad-except
+                logging.exception('Failed to compact the weather log')
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        """Stop compacting, letting any pass in progress finish"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+class Snapshotter:
+    """Saves snapshots of the weather log in the background
+
+    Once every `interval` seconds, and again when it's stopped, the
+    snapshotter captures the logger's index and rollups on the event loop
+    and has the log writer's worker thread write them out, so the next
+    startup only has to replay the records written after the snapshot.
+
+    Args:
+        writer (LogWriter): The writer for the log to snapshot
+        interval (float): The time between snapshots, in seconds
+    """
+    def __init__(self, writer, interval=3600):
+        self.writer = writer
+        self.interval = interval
+        self.task = None
+
+    @classmethod
+    def from_config(cls, writer, config):
+        """Create a snapshotter from the station config dict"""
+        return cls(writer, interval=config.get('snapshot_interval', 3600))
+
+    async def start(self):
+        """Start taking snapshots"""
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        """Take a snapshot once every interval"""
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    async def save(self):
+        """Capture a snapshot and write it out on the worker thread"""
+        logger = self.writer.logger
+        try:
+            snapshot = logger.capture_snapshot()
+            if snapshot is not None:
+                await self.writer.run_in_worker(logger.write_snapshot, snapshot)
+        except Exception: #pylint: disable=broad-except
+            logging.exception('Failed to save a weather log snapshot')
+
+    async def stop(self):
+        """Stop taking snapshots, saving a last one for the next startup"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        await self.save()
+
+def convert_json_log(json_path, binary_path, encoding='scaled'):
+    """Convert a JSON array weather log into the binary archive format
+
+    Args:
+        json_path (str): The path to an existing JSON weather log
+        binary_path (str): The path of the binary log to create
+        encoding (str): Either ``'scaled'`` or ``'float'``
+
+    Returns:
+        int: The number of records converted
+    """
+    if os.path.exists(binary_path):
+        raise FileExistsError('{} already exists'.format(binary_path))
+    archive = BinaryLogger(binary_path, encoding=encoding)
+    count = 0
+    with open(json_path, 'rb') as json_file, \
+            open(binary_path, 'ab') as binary_file:
+        for record in iter_json_array(json_file):
+            binary_file.write(archive.pack(WeatherRecord.from_dict(record)))
+            count += 1
+    logging.info('Converted %d records from %s to %s',
+                 count, json_path, binary_path)
+    return count
+
+def segment_entry(name, records):
+    """Build the manifest entry describing a segment's records
+
+    Besides its times and count, the entry carries a zone map: the lowest
+    and highest temperature and humidity in the segment, or ``None`` if
+    it has no readings of that kind.
+    """
+    entry = {
+        'file': name,
+        'start': records[0].datetime.isoformat(),
+        'end': records[-1].datetime.isoformat(),
+        'count': len(records),
+        'temp': None,
+        'humidity': None
+    }
+    for record in records:
+        update_zone(entry, record)
+    return entry
+
+def update_zone(entry, record):
+    """Widen a manifest entry's zone map to take in a record"""
+    for field in ('temp', 'humidity'):
+        value = getattr(record, field)
+        if value is None:
+            continue
+        zone = entry[field]
+        if zone is None:
+            entry[field] = [value, value]
+        else:
+            entry[field] = [min(zone[0], value), max(zone[1], value)]
+
+def entry_overlaps(entry, field, low, high):
+    """Returns ``True`` if a segment could hold readings in bounds
+
+    Args:
+        entry (dict): The segment's manifest entry
+        field (str): Either ``'temp'`` or ``'humidity'``
+        low (float): The lowest reading wanted, or ``None`` for no bound
+        high (float): The highest reading wanted, or ``None`` for no bound
+    """
+    if (low is None and high is None) or field not in entry:
+        # Nothing to check, or an entry from before zone maps
+        return True
+    zone = entry[field]
+    if zone is None:
+        return False
+    return ((low is None or zone[1] >= low)
+            and (high is None or zone[0] <= high))
+
+def in_bounds(value, low, high):
+    """Returns ``True`` if a reading falls within optional bounds"""
+    if low is None and high is None:
+        return True
+    return (value is not None
+            and (low is None or value >= low)
+            and (high is None or value <= high))
+
+def rewrite_tail(path, offset, head=b''):
+    """Atomically cut a file down to the bytes from an offset onwards
+
+    Args:
+        path (str): The path to the file
+        offset (int): The offset of the first byte to keep
+        head (bytes): Bytes to write ahead of the kept ones
+    """
+    temp_path = path + '.tmp'
+    with open(path, 'rb') as source, open(temp_path, 'wb') as target:
+        target.write(head)
+        source.seek(offset)
+        shutil.copyfileobj(source, target)
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(temp_path, path)
+
+def write_fully(raw_file, data):
+    """Write all of some bytes to an unbuffered file
+
+    An unbuffered write can stop short, so it's repeated until all of
+    the bytes are written, or it fails.
+    """
+    view = memoryview(data)
+    while view:
+        view = view[raw_file.write(view):]
+
+def append_fully(path, data):
+    """Append bytes to a file, all or nothing
+
+    If the write fails partway, when the card fills up say, the file is
+    cut back to where it was, so that the bytes can be appended again
+    without leaving a partial copy behind.
+
+    Args:
+        path (str): The path to the file
+        data (bytes): The bytes to append
+
+    Returns:
+        int: The offset the bytes were written at
+    """
+    with open(path, 'ab', buffering=0) as target:
+        start = target.seek(0, os.SEEK_END)
+        try:
+            write_fully(target, data)
+        except OSError:
+            target.truncate(start)
+            raise
+    return start
+
+def write_json_atomic(path, obj):
+    """Write a JSON file so readers never see it half-written
+
+    The JSON is written to a temporary file alongside the target, which
+    is then renamed over it.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as temp_file:
+        json.dump(obj, temp_file, indent=4)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_path, path)
+
+def iter_json_array(log_file, chunk_size=65536):
+    """Iterate over the elements of a JSON array file, one at a time
+
+    Args:
+        log_file (file): A JSON array file opened in binary mode
+        chunk_size (int): The number of bytes to read at a time
+
+    Yields:
+        The decoded elements of the array, in order
+
+    Raises:
+        ValueError: If the file isn't a well-formed JSON array
+    """
+    for _, element in scan_json_array(log_file, chunk_size=chunk_size):
+        yield element
+
+def scan_json_array(log_file, start=None, chunk_size=65536):
+    """Iterate over the elements of a JSON array file, with their offsets
+
+    The file is read a chunk at a time and each element is decoded as
+    soon as it is complete, so memory use is bounded by the chunk and
+    element sizes rather than the size of the array. Elements are
+    expected to be objects, which can't be mistaken for complete when
+    cut short at the end of a chunk.
+
+    Args:
+        log_file (file): A JSON array file opened in binary mode
+        start (int): An offset between two elements to start scanning
+            from, instead of the beginning of the array
+        chunk_size (int): The number of bytes to read at a time
+
+    Yields:
+        (tuple): The byte offset of each element, and its decoded value
+
+    Raises:
+        ValueError: If the file isn't a well-formed JSON array
+    """
+    # JSON logs are plain ASCII, since json.dump escapes everything else.
+    # Decoding as latin-1 keeps character offsets equal to byte offsets.
+    decoder = json.JSONDecoder()
+    if start is None:
+        buffer_offset = 0
+        buffer = log_file.read(chunk_size).decode('latin-1')
+        position = len(buffer) - len(buffer.lstrip())
+        if not buffer.startswith('[', position):
+            raise ValueError('File does not contain a JSON array')
+        position += 1
+    else:
+        log_file.seek(start)
+        buffer_offset = start
+        buffer = log_file.read(chunk_size).decode('latin-1')
+        position = 0
+    while True:
+        # Skip whitespace and separating commas, reading more as needed
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer):
+            buffer_offset += len(buffer)
+            buffer = log_file.read(chunk_size).decode('latin-1')
+            position = 0
+            if not buffer:
+                raise ValueError('Unterminated JSON array')
+            continue
+        if buffer[position] == ']':
+            return
+
+        try:
+            element, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The element runs past the end of the buffer. Drop what we've
+            # already decoded and read in the rest of it.
+            more = log_file.read(chunk_size).decode('latin-1')
+            if not more:
+                raise
+            buffer_offset += position
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+        yield buffer_offset + position, element
+        position = end
+
+def iter_json_lines(log_file):
+    """Iterate over the records in a JSON Lines file, skipping bad lines
+
+    Args:
+        log_file (file): A JSON Lines file opened in binary mode
+
+    Yields:
+        dict: Each readable record, in order
+    """
+    for line in log_file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+def iter_json_lines_reversed(log_file, block_size=4096):
+    """Iterate backwards over the records in a JSON Lines file
+
+    The file is read a block at a time from its end, so stopping after
+    the last few records costs the same however long the file is. Bad
+    lines are skipped, as they are by `iter_json_lines`.
+
+    Args:
+        log_file (file): A JSON Lines file opened in binary mode
+        block_size (int): How many bytes to read at a time
+
+    Yields:
+        dict: Each readable record, newest first
+    """
+    end = log_file.seek(0, os.SEEK_END)
+    partial = b''
+    while end > 0:
+        start = max(0, end - block_size)
+        log_file.seek(start)
+        lines = (log_file.read(end - start) + partial).split(b'\n')
+        # The first line may carry on from the block before
+        partial = lines.pop(0) if start else b''
+        end = start
+        for line in reversed(lines):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+def iter_record_lines(log_file):
+    """Iterate over the weather records in a JSON Lines file
+
+    Lines that aren't JSON, or aren't weather records, are skipped, just
+    as they are when a JSON Lines log is indexed.
+
+    Args:
+        log_file (file): A JSON Lines file opened in binary mode
+
+    Yields:
+        WeatherRecord: Each readable record, in order
+    """
+    for element in iter_json_lines(log_file):
+        try:
+            yield WeatherRecord.from_dict(element)
+        except (KeyError, TypeError, ValueError):
+            continue
+
+def find_array_end(log_file):
+    """Find where the next element of a JSON array file should be written
+
+    Only the last few kilobytes of the file are read, so this costs the
+    same however large the array is.
+
+    Args:
+        log_file (file): A JSON array file opened in binary mode
+
+    Returns:
+        (tuple): The offset just past the last element (or the opening
+            bracket), and whether the array is empty
+
+    Raises:
+        ValueError: If the file doesn't end with a JSON array
+    """
+    log_file.seek(0, os.SEEK_END)
+    size = log_file.tell()
+    start = max(0, size - 4096)
+    log_file.seek(start)
+    tail = log_file.read().rstrip()
+    if not tail.endswith(b']'):
+        raise ValueError('File does not end with a JSON array')
+    body = tail[:-1].rstrip()
+    if not body:
+        raise ValueError('Could not find the last element of the array')
+    return start + len(body), body.endswith(b'[')
+
+# Maps the `data_format` config option to the logger that implements it
+LOGGER_FORMATS = {
+    'json': WeatherLogger,
+    'jsonl': JSONLinesLogger,
+    'sqlite': SQLiteLogger,
+    'segmented': SegmentedLogger,
+    'binary': BinaryLogger
+}
+
+# The approximate memory an in-memory record takes: the record, its three
+# floats and its slot in the deque
+RECORD_BYTES = (sys.getsizeof(WeatherRecord(0.0, 0.0, 0.0))
+                + 3 * sys.getsizeof(0.0) + 8)
+
+# The UTC date format that names the segment for each segment period
+SEGMENT_NAME_FORMATS = {
+    'day': '%Y-%m-%d.jsonl',
+    'month': '%Y-%m.jsonl'
+}
+
+SEGMENT_COMPRESSION = {
+    'gzip': ('.gz', gzip.open),
+    'lzma': ('.xz', lzma.open),
+    'gorilla': ('.gor', None)
+}
+
+def open_logger(config):
+    """Create the weather logger described by the station config
+
+    Args:
+        config (dict): The station config. ``data_format`` selects one of
+            the ``LOGGER_FORMATS``; each logger reads its own options.
+
+    Returns:
+        WeatherStore: A logger loaded from (or newly created at) the
+            configured ``data_file``
+    """
+    data_format = config.get('data_format', 'json')
+    try:
+        logger_class = LOGGER_FORMATS[data_format]
+    except KeyError:
+        # Whine in the logs and fall back to the original JSON format
+        logging.error('Unrecognized data format \'%s\'. Using JSON',
+                      data_format)
+        logger_class = WeatherLogger
+    return logger_class.from_config(config)
+
+def main():
+    """Convert a JSON weather log into the binary archive format"""
+    parser = argparse.ArgumentParser(
+        description='Convert a JSON weather log to the binary archive format'
+    )
+    parser.add_argument('json_path', help='The JSON weather log to read')
+    parser.add_argument('binary_path', help='The binary log to create')
+    parser.add_argument('-e', '--encoding', default='scaled',
+                        choices=sorted(BinaryLogger.ENCODINGS),
+                        help='Store readings as scaled int16s or float32s')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        convert_json_log(args.json_path, args.binary_path, args.encoding)
+    except (FileExistsError, FileNotFoundError) as error:
+        parser.error(str(error))
+
+if __name__ == '__main__':
+    main()
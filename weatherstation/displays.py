@@ -13,6 +13,8 @@ import logging
 import grovepi #pylint: disable=import-error
 import grove_rgb_lcd #pylint: disable=import-error
 
+import grovebus
+
 class LedBar:
     """Implements a display interface for the GrovePi LED bar """
     def __init__(self, port):
@@ -74,8 +76,11 @@ class Screen:
 
     This interface simplifies setting color and brightness values for
     the screen, and provides functions to manage text refreshing.
+    Coroutines set the brightness with `set_brightness()`, and the
+    refresh loop writes text, on the GrovePi bus thread.
     """
-    def __init__(self):
+    def __init__(self, bus=grovebus.BUS):
+        self.bus = bus
         self.__backlight = {
             'brightness': 0,
             'color': {
@@ -86,6 +91,7 @@ class Screen:
         }
         self.__monitor_stopped = False
         self.__monitor = None
+        self.__refresh = None
         self.__text = ''
         self.__new_text = ''
         self.__color = (1.0, 1.0, 1.0)
@@ -98,7 +104,20 @@ class Screen:
     @brightness.setter
     def brightness(self, level):
         self.__backlight['brightness'] = level * 16
-        grove_rgb_lcd.setRGB(
+        grove_rgb_lcd.setRGB(*self.backlight_rgb)
+        self.request_refresh()
+
+    async def set_brightness(self, level):
+        """Sets the backlight brightness level, on the bus"""
+        self.__backlight['brightness'] = level * 16
+        self.request_refresh()
+        await self.bus.write(grovebus.PRIORITY_DISPLAY, grove_rgb_lcd.setRGB,
+                             *self.backlight_rgb)
+
+    @property
+    def backlight_rgb(self):
+        """Returns the backlight color at its brightness, as 8-bit RGB"""
+        return (
             int(self.__backlight['brightness'] * self.__backlight['color']['red']),
             int(self.__backlight['brightness'] * self.__backlight['color']['green']),
             int(self.__backlight['brightness'] * self.__backlight['color']['blue'])
@@ -143,6 +162,12 @@ class Screen:
             elif self.text != '':
                 self.__new_text = ''
                 logging.debug('Brightness is zero. Queued screen blank')
+            self.request_refresh()
+
+    def request_refresh(self):
+        """Wake the refresh loop to check for new text"""
+        if self.__refresh is not None:
+            self.__refresh.set()
 
     async def monitor(self):
         """Refresh the screen text when new text is supplied
@@ -150,16 +175,20 @@ class Screen:
         We run a number of different refresh rates on a variety of
         synchronous and asynchronous loops. Rather than updating the
         text on-screen every time it is set, update it only if it has
-        changed, to prevent flickering.
+        changed, to prevent flickering. The loop sleeps until the text or
+        brightness changes, rather than checking every tick.
         """
         while not self.__monitor_stopped:
+            await self.__refresh.wait()
+            self.__refresh.clear()
             try:
                 if self.brightness == 0 and self.text != '':
                     self.text = ''
                 if self.__new_text != self.text:
                     logging.debug('New text in queue. Updating text')
                     self.__text = self.__new_text
-                    grove_rgb_lcd.setText(self.__text)
+                    await self.bus.write(grovebus.PRIORITY_DISPLAY,
+                                         grove_rgb_lcd.setText, self.__text)
                 await asyncio.sleep(0.05)
             except IOError:
                 # Very occasionally, setText will spit out an IOError that
@@ -177,14 +206,16 @@ class Screen:
         brief startup animation, incrementing the LCD's backlight
         brightness to the provided value.
         """
+        self.__refresh = asyncio.Event()
         self.__monitor = asyncio.create_task(self.monitor())
 
         # Startup animation. Leave it to the user to replace initial text
         logging.info('Screen started')
         self.text = message
-        grove_rgb_lcd.setText(message)
+        await self.bus.write(grovebus.PRIORITY_DISPLAY, grove_rgb_lcd.setText,
+                             message)
         for i in range(0, brightness):
-            self.brightness = i
+            await self.set_brightness(i)
             await asyncio.sleep(0.025)
 
     async def stop(self, brightness):
@@ -194,7 +225,7 @@ class Screen:
 
         # run a shutdown animation, stepping back through brightness levels
         for i in range(brightness, -1, -1):
-            self.brightness = i
+            await self.set_brightness(i)
             await asyncio.sleep(0.025)
 
         # Blank the screen
@@ -203,4 +234,5 @@ class Screen:
 
         # cancel screen refresh and catch the expected CancelledError
         self.__monitor_stopped = True
+        self.request_refresh()
         await self.__monitor
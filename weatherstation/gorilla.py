@@ -0,0 +1,257 @@
+"""Implements Gorilla-style compression for weather samples
+
+Samples are packed into a single bit stream, following the scheme
+Facebook described for its Gorilla time series database. Timestamps are
+stored as the difference between successive deltas, which is zero for
+samples taken on a regular period, so most take a single bit. Readings
+are stored as the XOR of each value with the one before it, which is
+zero, or has only a few meaningful bits, when the weather holds steady.
+
+Timestamps are kept to the microsecond, as precisely as the JSON logs
+keep them, so a record's time survives the round trip. Streams written
+when they were kept to the second can still be read. Missing readings
+are stored as NaN and come back as ``None``.
+
+Functions:
+    encode(samples): Pack (time, temp, humidity) samples into bytes
+    decode(data): Unpack samples from bytes, one at a time
+"""
+import math
+import struct
+
+HEADER = struct.Struct('<7scI')
+MAGIC = b'WETSPEC'
+CODE = b'u'
+
+MASK_64 = (1 << 64) - 1
+DOUBLE = struct.Struct('<d')
+UINT64 = struct.Struct('<Q')
+NAN_BITS = 0x7ff8000000000000
+
+# Bucket prefixes and field widths for deltas of deltas, from the paper,
+# except that the catch-all bucket is widened to fit any 64-bit value
+DELTA_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12)
+)
+
+# Samples land up to a second or so off their period, which is up to a
+# million microseconds, so microsecond streams add a bucket for that
+MICROSECOND_BUCKETS = DELTA_BUCKETS + ((0b11110, 5, 24),)
+
+# The time units and delta buckets for each stream code
+TIME_CODES = {
+    b'g': (1, DELTA_BUCKETS),
+    b'u': (1000000, MICROSECOND_BUCKETS)
+}
+
+class BitWriter:
+    """Collects values of any bit width into a byte string"""
+    def __init__(self):
+        self.buffer = bytearray()
+        self.bits = 0
+        self.count = 0
+
+    def write(self, value, length):
+        """Write the low `length` bits of a value"""
+        self.bits = (self.bits << length) | (value & ((1 << length) - 1))
+        self.count += length
+        while self.count >= 8:
+            self.count -= 8
+            self.buffer.append(self.bits >> self.count)
+            self.bits &= (1 << self.count) - 1
+
+    def getvalue(self):
+        """Return everything written, padded out to a whole byte"""
+        if self.count:
+            return bytes(self.buffer) + bytes([self.bits << (8 - self.count)])
+        return bytes(self.buffer)
+
+class BitReader:
+    """Reads values of any bit width back out of a byte string"""
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.position = offset
+        self.bits = 0
+        self.count = 0
+
+    def read(self, length):
+        """Read the next `length` bits as an unsigned integer"""
+        while self.count < length:
+            if self.position >= len(self.data):
+                raise ValueError('Gorilla stream ended early')
+            self.bits = (self.bits << 8) | self.data[self.position]
+            self.position += 1
+            self.count += 8
+        self.count -= length
+        value = self.bits >> self.count
+        self.bits &= (1 << self.count) - 1
+        return value
+
+class XOREncoder:
+    """Writes a series of floats as the XOR of each with the last"""
+    def __init__(self, writer):
+        self.writer = writer
+        self.last = None
+        self.leading = None
+        self.trailing = None
+
+    def write(self, value):
+        """Write the next value in the series"""
+        bits = to_bits(value)
+        if self.last is None:
+            self.writer.write(bits, 64)
+            self.last = bits
+            return
+        xor = bits ^ self.last
+        self.last = bits
+        if xor == 0:
+            self.writer.write(0, 1)
+            return
+        leading = min(64 - xor.bit_length(), 31)
+        trailing = (xor & -xor).bit_length() - 1
+        if (self.leading is not None and leading >= self.leading
+                and trailing >= self.trailing):
+            # The meaningful bits fit in the last value's window
+            self.writer.write(0b10, 2)
+            self.writer.write(xor >> self.trailing,
+                              64 - self.leading - self.trailing)
+        else:
+            size = 64 - leading - trailing
+            self.writer.write(0b11, 2)
+            self.writer.write(leading, 5)
+            # A size of 64 doesn't fit in six bits, so it's written as 0
+            self.writer.write(size & 63, 6)
+            self.writer.write(xor >> trailing, size)
+            self.leading, self.trailing = leading, trailing
+
+class XORDecoder:
+    """Reads back a series of floats written by an `XOREncoder`"""
+    def __init__(self, reader):
+        self.reader = reader
+        self.last = None
+        self.leading = None
+        self.trailing = None
+
+    def read(self):
+        """Read the next value in the series"""
+        if self.last is None:
+            self.last = self.reader.read(64)
+        elif self.reader.read(1):
+            if self.reader.read(1):
+                self.leading = self.reader.read(5)
+                size = self.reader.read(6) or 64
+                self.trailing = 64 - self.leading - size
+            else:
+                size = 64 - self.leading - self.trailing
+            self.last ^= self.reader.read(size) << self.trailing
+        return from_bits(self.last)
+
+def encode(samples):
+    """Pack weather samples into a Gorilla stream
+
+    Args:
+        samples: An iterable of (time, temp, humidity) tuples, in time
+            order, with times in epoch seconds. Times are rounded to the
+            microsecond.
+
+    Returns:
+        bytes: The header and packed samples
+    """
+    units, buckets = TIME_CODES[CODE]
+    writer = BitWriter()
+    temps = XOREncoder(writer)
+    humidities = XOREncoder(writer)
+    count = 0
+    last_time = None
+    last_delta = 0
+    for time, temp, humidity in samples:
+        time = round(time * units)
+        if last_time is None:
+            writer.write(time & MASK_64, 64)
+        else:
+            delta = time - last_time
+            write_delta(writer, delta - last_delta, buckets)
+            last_delta = delta
+        last_time = time
+        temps.write(temp)
+        humidities.write(humidity)
+        count += 1
+    return HEADER.pack(MAGIC, CODE, count) + writer.getvalue()
+
+def decode(data):
+    """Unpack weather samples from a Gorilla stream
+
+    Args:
+        data (bytes): A stream written by `encode()`
+
+    Yields:
+        tuple: Each (time, temp, humidity) sample, in order
+
+    Raises:
+        ValueError: If the data isn't a complete Gorilla stream
+    """
+    if len(data) < HEADER.size:
+        raise ValueError('Gorilla stream is too short')
+    magic, code, count = HEADER.unpack_from(data)
+    if magic != MAGIC or code not in TIME_CODES:
+        raise ValueError('Data is not a Gorilla stream')
+    units, buckets = TIME_CODES[code]
+    reader = BitReader(data, HEADER.size)
+    temps = XORDecoder(reader)
+    humidities = XORDecoder(reader)
+    time = None
+    delta = 0
+    for _ in range(count):
+        if time is None:
+            time = to_signed(reader.read(64))
+        else:
+            delta += read_delta(reader, buckets)
+            time += delta
+        yield time / units, temps.read(), humidities.read()
+
+def write_delta(writer, value, buckets=DELTA_BUCKETS):
+    """Write a delta of deltas, in the smallest bucket that fits it"""
+    if value == 0:
+        writer.write(0, 1)
+        return
+    for prefix, prefix_length, length in buckets:
+        bias = (1 << (length - 1)) - 1
+        if -bias <= value <= bias + 1:
+            writer.write(prefix, prefix_length)
+            writer.write(value + bias, length)
+            return
+    # The catch-all prefix is all ones, as long as the last bucket's
+    prefix_length = buckets[-1][1]
+    writer.write((1 << prefix_length) - 1, prefix_length)
+    writer.write(value & MASK_64, 64)
+
+def read_delta(reader, buckets=DELTA_BUCKETS):
+    """Read a delta of deltas written by `write_delta()`"""
+    if not reader.read(1):
+        return 0
+    # Each bucket's prefix is one more one than the last, ending in a zero
+    for _, _, length in buckets:
+        if not reader.read(1):
+            return reader.read(length) - ((1 << (length - 1)) - 1)
+    return to_signed(reader.read(64))
+
+def to_bits(value):
+    """Return the IEEE 754 bits of a reading, using NaN for ``None``"""
+    if value is None:
+        return NAN_BITS
+    return UINT64.unpack(DOUBLE.pack(value))[0]
+
+def from_bits(bits):
+    """Return the reading for some IEEE 754 bits, or ``None`` for NaN"""
+    value = DOUBLE.unpack(UINT64.pack(bits))[0]
+    if math.isnan(value):
+        return None
+    return value
+
+def to_signed(value):
+    """Interpret an unsigned 64-bit integer as two's complement"""
+    if value >= 1 << 63:
+        return value - (1 << 64)
+    return value
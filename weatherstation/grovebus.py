@@ -0,0 +1,186 @@
+"""Schedules GrovePi calls off the event loop, one at a time
+
+Every GrovePi call blocks until the device answers, which takes
+hundreds of milliseconds for a DHT read. Made from a coroutine, a call
+like that freezes everything else on the event loop, so the device
+classes send their calls through a `GroveBus` instead. It runs them on a
+single worker thread, which keeps the event loop free and makes sure
+only one call is on the bus at a time.
+
+Requests are collected and served once per tick, in priority order, so
+a button press is never stuck behind a screen refresh or a DHT read.
+Identical reads requested in the same tick, like the stop button being
+polled from several loops, are made once and shared. The bus also keeps
+to a utilization budget: once the calls have kept it busy for more than
+its share of the time, only the button is read until it catches up.
+
+Classes:
+    GroveBus
+
+Attributes:
+    PRIORITY_BUTTON, PRIORITY_DIAL, PRIORITY_DISPLAY, PRIORITY_DHT (int):
+        The priority classes, highest first
+    BUS (GroveBus): The bus shared by devices that aren't given one
+"""
+import asyncio
+import concurrent.futures
+import logging
+import time
+
+PRIORITY_BUTTON = 0
+PRIORITY_DIAL = 1
+PRIORITY_DISPLAY = 2
+PRIORITY_DHT = 3
+
+class GroveBus:
+    """Schedules GrovePi calls on a single worker thread
+
+    Args:
+        tick_seconds (float): How often to serve the requests collected
+        budget (float): The fraction of the time the bus may be busy
+    """
+    def __init__(self, tick_seconds=0.05, budget=0.5):
+        self.tick_seconds = tick_seconds
+        self.budget = budget
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='grovepi'
+        )
+        self.requests = {}
+        self.sequence = 0
+        self.wakeup = None
+        self.task = None
+        # Unused bus time, in seconds, which the calls are paid out of
+        self.credit = budget
+        self.started = None
+        self.calls = 0
+        self.coalesced = 0
+        self.deferred = 0
+        self.busy_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a bus from the station config dict"""
+        return cls(
+            tick_seconds=config.get('bus_tick_seconds', 0.05),
+            budget=config.get('bus_budget', 0.5)
+        )
+
+    async def read(self, priority, function, *args):
+        """Read from a device, sharing the result with identical reads
+
+        Args:
+            priority (int): The priority class of the request
+            function: The GrovePi function to call
+            *args: The arguments to call it with
+
+        Returns:
+            The result of the call
+        """
+        key = (priority, function, args)
+        if key in self.requests:
+            self.coalesced += 1
+            return await asyncio.shield(self.requests[key][4])
+        return await self.submit(key, priority, function, args)
+
+    async def write(self, priority, function, *args):
+        """Write to a device, after every write requested before it
+
+        Args:
+            priority (int): The priority class of the request
+            function: The GrovePi function to call
+            *args: The arguments to call it with
+
+        Returns:
+            The result of the call
+        """
+        return await self.submit(None, priority, function, args)
+
+    async def submit(self, key, priority, function, args):
+        """Queue a request for the next tick and wait for its result"""
+        if self.task is None:
+            self.start()
+        self.sequence += 1
+        if key is None:
+            # Writes are never shared, so each gets a key of its own
+            key = self.sequence
+        future = asyncio.get_running_loop().create_future()
+        self.requests[key] = (priority, self.sequence, function, args, future)
+        self.wakeup.set()
+        return await asyncio.shield(future)
+
+    def start(self):
+        """Start serving requests, from the running event loop"""
+        self.wakeup = asyncio.Event()
+        self.started = time.perf_counter()
+        self.task = asyncio.create_task(self.run())
+        logging.info('Started GrovePi bus (%.0f ms ticks, %.0f%% budget)',
+                     self.tick_seconds * 1000, self.budget * 100)
+
+    async def run(self):
+        """Serve the requests collected in each tick, highest priority first"""
+        loop = asyncio.get_running_loop()
+        last_tick = loop.time()
+        while True:
+            if not self.requests:
+                # Sleep until there's something to do, rather than ticking
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            # Wait for the next tick, so requests made together are served
+            # together
+            now = loop.time()
+            await asyncio.sleep(self.tick_seconds - now % self.tick_seconds)
+            now = loop.time()
+            self.credit = min(self.budget, self.credit
+                              + (now - last_tick) * self.budget)
+            last_tick = now
+            await self.serve_tick()
+
+    async def serve_tick(self):
+        """Serve the requests waiting at the start of a tick"""
+        loop = asyncio.get_running_loop()
+        waiting = sorted(self.requests.items(), key=lambda item: item[1][:2])
+        for key, (priority, _, function, args, future) in waiting:
+            if self.credit <= 0 and priority > PRIORITY_BUTTON:
+                # Over budget, so leave it for a later tick
+                self.deferred += 1
+                continue
+            del self.requests[key]
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(self.executor, function,
+                                                    *args)
+            except Exception as error: #pylint: disable=broad-except
+                # Hand GrovePi's errors to whoever made the request
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+            finally:
+                duration = time.perf_counter() - start
+                self.credit -= duration
+                self.busy_seconds += duration
+                self.calls += 1
+
+    @property
+    def utilization(self):
+        """The fraction of the time since the bus started that it was busy"""
+        if self.started is None:
+            return 0.0
+        return self.busy_seconds / max(time.perf_counter() - self.started,
+                                       1e-9)
+
+    async def stop(self):
+        """Stop serving requests and stop the bus thread"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.executor.shutdown()
+        logging.info('Stopped GrovePi bus: %d calls, %d reads coalesced, '
+                     '%d deferred over budget, %.1f%% utilization',
+                     self.calls, self.coalesced, self.deferred,
+                     self.utilization * 100)
+
+BUS = GroveBus()
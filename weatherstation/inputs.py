@@ -0,0 +1,159 @@
+"""Samples the station's inputs in one place and publishes their changes
+
+Rather than each loop polling the button, dial and light sensor for
+itself, an `InputSampler` reads every input once per tick and tells its
+subscribers when a value changes. A subscriber waits on its
+`Subscription` and wakes only when there's something new. Inputs that
+nobody is subscribed to aren't read at all.
+
+Classes:
+    InputSampler
+    Subscription
+"""
+import asyncio
+import logging
+
+class InputSampler:
+    """Reads a set of inputs once per tick and publishes their changes
+
+    Args:
+        inputs (dict): A coroutine function for each input, by name,
+            which reads its current value
+        period (float): The time between samples, in seconds. It can be
+            changed while sampling, and takes effect after the next tick.
+
+    Attributes:
+        values (dict): The latest value of each input being sampled
+        changed_at (dict): The event loop time each input last changed
+        samples (int): The number of ticks the inputs have been read in
+    """
+    def __init__(self, inputs, period=0.05):
+        self.inputs = inputs
+        self.period = period
+        self.values = {}
+        self.changed_at = {}
+        self.samples = 0
+        self.subscriptions = []
+        self.subscribed = None
+        self.task = None
+
+    def subscribe(self, *names):
+        """Subscribe to changes in some of the inputs
+
+        The subscription starts with the current value of each input that
+        has been sampled, then gets every change after that.
+
+        Args:
+            *names (str): The inputs to subscribe to
+
+        Returns:
+            Subscription: An async iterator of ``(name, value)`` changes
+        """
+        subscription = Subscription(self, names)
+        for name in names:
+            if name in self.values:
+                subscription.queue.put_nowait((name, self.values[name]))
+        self.subscriptions.append(subscription)
+        if self.subscribed is not None:
+            self.subscribed.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop sending changes to a subscription"""
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    async def start(self):
+        """Start sampling the inputs"""
+        self.subscribed = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+        logging.info('Started input sampler')
+
+    async def run(self):
+        """Sample the subscribed inputs each tick, publishing any changes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            names = [
+                name for name in self.inputs
+                if any(name in subscription.names
+                       for subscription in self.subscriptions)
+            ]
+            for name in list(self.values):
+                if name not in names:
+                    # Forget values that are no longer kept up to date, so
+                    # the next subscriber gets a fresh one
+                    del self.values[name]
+            if not names:
+                self.subscribed.clear()
+                await self.subscribed.wait()
+                continue
+            self.samples += 1
+            try:
+                # Read them together, so the bus serves them in one tick
+                values = await asyncio.gather(
+                    *(self.inputs[name]() for name in names)
+                )
+            except Exception: #pylint: disable=broad-except
+                # A failed read is retried next tick, like a screen refresh.
+                # Letting it end the sampler would leave everything waiting
+                # on it, shutdown included, asleep for good.
+                logging.exception('Failed to sample inputs')
+            else:
+                for name, value in zip(names, values):
+                    if name not in self.values or self.values[name] != value:
+                        self.values[name] = value
+                        self.changed_at[name] = loop.time()
+                        self.publish(name, value)
+            await asyncio.sleep(self.period)
+
+    def publish(self, name, value):
+        """Send a change to every subscription to that input"""
+        for subscription in self.subscriptions:
+            if name in subscription.names:
+                subscription.queue.put_nowait((name, value))
+
+    async def stop(self):
+        """Stop sampling the inputs"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        logging.info('Stopped input sampler')
+
+class Subscription:
+    """Delivers the changes to some of an `InputSampler`'s inputs
+
+    Iterate over it with ``async for`` to wait for each change in turn.
+    Use it as a context manager to unsubscribe when done with it.
+
+    Args:
+        sampler (InputSampler): The sampler publishing the changes
+        names (tuple): The names of the inputs subscribed to
+    """
+    def __init__(self, sampler, names):
+        self.sampler = sampler
+        self.names = names
+        self.queue = asyncio.Queue()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.get()
+
+    async def get(self):
+        """Wait for the next change, and return its name and value"""
+        return await self.queue.get()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unsubscribe from the sampler"""
+        self.sampler.unsubscribe(self)
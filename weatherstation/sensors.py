@@ -4,24 +4,49 @@ This module provides classes for interaction with the two sensor devices
 on the GrovePi weather station, the light sensor and the Digital
 Humidity and Temperature (DHT) sensor.
 
+Each sensor can be read either directly, or with ``await sensor.read()``
+from a coroutine, which runs the read on the GrovePi bus thread.
+
 Classes:
     LightSensor
     DHTSensor
+
+Functions:
+    convert_temp(temp_c, unit): Convert a Celsius temperature
 """
 import logging
+import time
 import grovepi #pylint: disable=import-error
 
+import grovebus
+
 class LightSensor:
-    """Implements the light sensor interface"""
-    def __init__(self, port, threshold=20):
+    """Implements the light sensor interface
+
+    Readings that hover around the threshold, at dawn and dusk, would
+    flip the sensor back and forth, so it only goes over the threshold
+    once a reading clears it by ``hysteresis``, and only goes back under
+    once a reading falls that far below it.
+
+    Args:
+        port (int): The port connected to the sensor
+        threshold (int): The raw reading that separates light from dark
+        hysteresis (int): How far past the threshold a reading must go
+            to cross it
+        bus (GroveBus): The bus to read the sensor through from coroutines
+    """
+    def __init__(self, port, threshold=20, hysteresis=0, bus=grovebus.BUS):
         self.__port = port
         self.__light_threshold = threshold
+        self.__hysteresis = hysteresis
+        self.__over = False
+        self.bus = bus
         grovepi.pinMode(self.__port, "INPUT")
 
     @property
     def over_threshold(self):
         """Returns true if sensor value is greater than set threshold"""
-        return grovepi.analogRead(self.__port) > self.__light_threshold
+        return self.crossed(grovepi.analogRead(self.__port))
 
     @property
     def tenths_value(self):
@@ -38,15 +63,54 @@ class LightSensor:
         """Return the current raw light sensor reading"""
         return grovepi.analogRead(self.__port)
 
+    async def read(self):
+        """Return the current raw light sensor reading, read on the bus"""
+        # The light sensor is polled as often as the dial, so it shares
+        # the dial's priority
+        return await self.bus.read(grovebus.PRIORITY_DIAL, grovepi.analogRead,
+                                   self.__port)
+
+    async def read_over_threshold(self):
+        """Return true if a reading on the bus is over the threshold"""
+        return self.crossed(await self.read())
+
+    def crossed(self, sensor_value):
+        """Return whether the sensor is over the threshold after a reading"""
+        if self.__over:
+            self.__over = (sensor_value
+                           > self.__light_threshold - self.__hysteresis)
+        else:
+            self.__over = (sensor_value
+                           > self.__light_threshold + self.__hysteresis)
+        return self.__over
+
 class DHTSensor:
     """Implements the DHT sensor interface
 
+    Each read ties up the bus for hundreds of milliseconds, so a reading
+    is cached and shared by every caller for ``cache_seconds``. Reading
+    the temperature and then the humidity costs a single bus read.
+
     Args:
         port (int): The port connected to the sensor
         sensor_color (str): Either ``'blue'`` or ``'white'``
+        cache_seconds (float): How long to reuse a reading before taking
+            a new one
+        bus (GroveBus): The bus to read the sensor through from coroutines
+
+    Attributes:
+        hits (int): The number of reads served from the cache
+        misses (int): The number of reads that went to the sensor
     """
-    def __init__(self, port, sensor_color='blue'):
+    def __init__(self, port, sensor_color='blue', cache_seconds=2,
+                 bus=grovebus.BUS):
         self.__port = port
+        self.cache_seconds = cache_seconds
+        self.bus = bus
+        self.hits = 0
+        self.misses = 0
+        self.__reading = None
+        self.__read_time = None
         # Apparently grove makes two DHT sensors. Mine is blue.
         if sensor_color == 'white':
             self.__sensor_color = 1
@@ -61,16 +125,7 @@ class DHTSensor:
 
     def temp(self, unit='c'):
         """Return just the current temperature"""
-        temp_c = self.read_both()[0]
-        if unit == 'c':
-            return temp_c
-        if unit == 'f':
-            return (temp_c * (9/5)) + 32
-        if unit == 'k':
-            return temp_c + 273.15
-        # Whine in the log and return temp in Celsius
-        logging.error('Unrecognized temperature unit \'%s\'', unit)
-        return temp_c
+        return convert_temp(self.read_both()[0], unit)
 
     @property
     def humidity(self):
@@ -78,9 +133,63 @@ class DHTSensor:
         return self.read_both()[1]
 
     def read_both(self):
-        """Record and set both temperature and humidity values"""
-        [temp, humidity] = grovepi.dht(
-            self.__port,
-            self.__sensor_color
-        )
-        return (temp, humidity)
+        """Return both temperature and humidity, reading them if needed"""
+        reading = self.cached_reading()
+        if reading is None:
+            reading = self.store_reading(grovepi.dht(
+                self.__port,
+                self.__sensor_color
+            ))
+        return reading
+
+    async def read(self, unit='c'):
+        """Return both temperature and humidity, reading them on the bus
+
+        Args:
+            unit (str): The temperature unit, ``'c'``, ``'f'`` or ``'k'``
+
+        Returns:
+            tuple: The temperature and the relative humidity
+        """
+        reading = self.cached_reading()
+        if reading is None:
+            reading = self.store_reading(await self.bus.read(
+                grovebus.PRIORITY_DHT,
+                grovepi.dht,
+                self.__port,
+                self.__sensor_color
+            ))
+        return (convert_temp(reading[0], unit), reading[1])
+
+    def cached_reading(self):
+        """Return the cached reading, or ``None`` if it's too old"""
+        if (self.__reading is not None
+                and time.monotonic() - self.__read_time < self.cache_seconds):
+            self.hits += 1
+            return self.__reading
+        self.misses += 1
+        return None
+
+    def store_reading(self, reading):
+        """Cache a new reading from the sensor and return it"""
+        [temp, humidity] = reading
+        self.__reading = (temp, humidity)
+        self.__read_time = time.monotonic()
+        return self.__reading
+
+def convert_temp(temp_c, unit):
+    """Convert a Celsius temperature to another unit
+
+    Args:
+        temp_c (float): The temperature in Celsius
+        unit (str): ``'c'``, ``'f'`` or ``'k'``
+    """
+    if unit == 'c':
+        return temp_c
+    if unit == 'f':
+        return (temp_c * (9/5)) + 32
+    if unit == 'k':
+        return temp_c + 273.15
+    # Whine in the log and return temp in Celsius
+    logging.error('Unrecognized temperature unit \'%s\'', unit)
+    return temp_c
@@ -7,6 +7,7 @@ during daylight, displays current conditions to an LCD display, and
 writes data to a JSON file for future use.
 
 Classes:
+    State
     WeatherStation
 
 Functions:
@@ -21,6 +22,7 @@ import asyncio
 import argparse
 from concurrent.futures import CancelledError
 import datetime as dt
+import enum
 import json
 import logging
 import os
@@ -35,6 +37,8 @@ import requests
 import controls
 import data
 import displays
+import grovebus
+import inputs
 import sensors
 
 def init_args():
@@ -156,6 +160,12 @@ def server_running():
 
     return server_process_ok and server_response_ok
 
+class State(enum.Enum):
+    """The states the main weather station loop moves between"""
+    DAY = 'day'
+    NIGHT = 'night'
+    SHUTTING_DOWN = 'shutting down'
+
 class WeatherStation:
     """Implements the core functionality of the weather station
 
@@ -170,6 +180,7 @@ class WeatherStation:
             port connected to the hardware rotary dial
         screen (Screen): A Screen object. Since the screen uses I2C, it
             requires no special configuration
+        state (State): The state the main loop is in, once it's running
 
     """
     def __init__(self, config_dict):
@@ -183,52 +194,80 @@ class WeatherStation:
             WeatherStation: An initialized WeatherStation object
         """
         self.config = config_dict
+        # Every device shares one bus, which schedules their GrovePi calls
+        self.bus = grovebus.GroveBus.from_config(self.config)
         # self.ledbar = displays.LedBar(self.config['ports']['ledbar_port'])
-        self.stop_button = controls.Button(self.config['ports']['button_port'])
+        self.stop_button = controls.Button(self.config['ports']['button_port'],
+                                           bus=self.bus)
         self.light_sensor = sensors.LightSensor(
             self.config['ports']['light_port'],
-            self.config['light_threshold']
+            self.config['light_threshold'],
+            hysteresis=self.config['light_hysteresis'],
+            bus=self.bus
+        )
+        self.dht = sensors.DHTSensor(
+            self.config['ports']['dht_port'],
+            cache_seconds=self.config['dht_cache_seconds'],
+            bus=self.bus
         )
-        self.dht = sensors.DHTSensor(self.config['ports']['dht_port'])
-        self.dial = controls.RotaryDial(self.config['ports']['dial_port'])
-        self.screen = displays.Screen()
-        self.data_log = data.WeatherLogger(self.config['data_file'])
+        self.dial = controls.RotaryDial(self.config['ports']['dial_port'],
+                                        bus=self.bus)
+        self.screen = displays.Screen(bus=self.bus)
+        # One task samples the inputs, and everything else waits on it
+        self.inputs = inputs.InputSampler({
+            'button': self.stop_button.read,
+            'dial': self.dial.read,
+            'light': self.light_sensor.read_over_threshold
+        }, period=self.config['input_tick_seconds'])
+        self.data_log = data.open_logger(self.config)
+        self.data_writer = data.LogWriter.from_config(self.data_log,
+                                                      self.config)
+        self.compactor = data.Compactor.from_config(self.data_writer,
+                                                    self.config)
+        self.snapshotter = data.Snapshotter.from_config(self.data_writer,
+                                                        self.config)
+        self.state = None
+        self.state_entered = None
+        self.state_calls = 0
+        self.state_samples = 0
+        self.wakeups = 0
+        self.stopping = asyncio.Event()
 
     async def run(self):
         """Runs the main weather station loop
 
         This method defines the main run process for the WeatherStation.
-        It runs a weather update task while the light sensor value is
-        above the configured threshold, or lights the single red LED at
-        the high end of the LED bar when the sensor is below that value.
+        It runs a weather update task throughout, while the main loop
+        moves between three states. By DAY, the screen is lit to the
+        dial's brightness. By NIGHT, the screen is blanked, or the single
+        red LED at the high end of the LED bar is lit, and the inputs are
+        sampled less often, since only the light and the stop button are
+        being watched. The loop moves between them once the light sensor
+        has crossed its threshold and stayed across it for
+        ``light_dwell_seconds``, and it moves to SHUTTING_DOWN when the
+        stop button is pressed or the station gets a SIGTERM. In between,
+        it sleeps until an input it's watching changes.
+
         This method is called automatically at the end of `start()`.
         """
-        signal.signal(signal.SIGTERM, self.signal_handler)
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, self.signal_handler,
+                                signal.SIGTERM)
         try:
             weather_update_task = asyncio.create_task(self.weather_update())
             server_status_task = asyncio.create_task(self.watch_server())
-            while not self.stop_button.pressed:
-                last_brightness = self.dial.value
-                self.screen.brightness = last_brightness
-                self.weather_display(self.data_log.last_record)
-                while (self.light_sensor.over_threshold
-                    and not self.stop_button.pressed):
-                    # Update the displays until it gets dark
-                    new_brightness = self.dial.value
-                    self.screen.brightness = new_brightness
-                    if last_brightness == 0 and new_brightness != 0:
-                        self.weather_display(self.data_log.last_record)
-                    last_brightness = new_brightness
-                    await asyncio.sleep(0.05)
-
-                # Light the red LED at the end of the LED bar while it's dark
-                # self.ledbar.light_led(10)
-                self.screen.text = ''
-                self.screen.brightness = 0
-                while (not self.light_sensor.over_threshold
-                    and not self.stop_button.pressed):
-                    # Wait for it to get light again.
-                    await asyncio.sleep(0.05)
+            with self.inputs.subscribe('light') as changes:
+                name, daylight = await self.next_change(changes)
+            if name is None:
+                state = State.SHUTTING_DOWN
+            else:
+                state = State.DAY if daylight else State.NIGHT
+            due = loop.time()
+            while True:
+                await self.enter_state(state, due)
+                if state is State.SHUTTING_DOWN:
+                    break
+                state, due = await self.wait_for_transition(state)
 
             # Tidy up when we're done
             weather_update_task.cancel()
@@ -240,9 +279,139 @@ class WeatherStation:
             # they're anticipated, and we can safely ignore them.
             pass
 
-    def signal_handler(self, signal_received, frame):
+    async def wait_for_transition(self, state):
+        """Sleep until the main loop should leave a state
+
+        Args:
+            state (State): The state the loop is in, DAY or NIGHT
+
+        Returns:
+            tuple: The state to move to, and the event loop time the move
+                became due
+        """
+        loop = asyncio.get_running_loop()
+        names = ['button', 'light']
+        if state is State.DAY:
+            # The dial is only read while the screen is lit
+            names.append('dial')
+        # When the light crossed its threshold, plus the dwell time
+        deadline = None
+        with self.inputs.subscribe(*names) as changes:
+            while True:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(0, deadline - loop.time())
+                try:
+                    name, value = await self.next_change(changes, timeout)
+                except asyncio.TimeoutError:
+                    # The light has stayed across the threshold long enough
+                    if state is State.DAY:
+                        return State.NIGHT, deadline
+                    return State.DAY, deadline
+                self.wakeups += 1
+                if name is None:
+                    # SIGTERM asked us to stop
+                    return State.SHUTTING_DOWN, loop.time()
+                if name == 'button':
+                    if value:
+                        return (State.SHUTTING_DOWN,
+                                self.inputs.changed_at['button'])
+                elif name == 'light':
+                    if value == (state is State.DAY):
+                        # It crossed back before the dwell time was up
+                        deadline = None
+                    elif deadline is None:
+                        deadline = (self.inputs.changed_at['light']
+                                    + self.config['light_dwell_seconds'])
+                else:
+                    last_brightness = self.screen.brightness
+                    await self.screen.set_brightness(value)
+                    if last_brightness == 0 and value != 0:
+                        self.weather_display(self.data_log.last_record)
+
+    async def next_change(self, changes, timeout=None):
+        """Wait for the next change to some inputs, or for shutdown
+
+        Shutting down doesn't wait on the input sampler, so a SIGTERM
+        still stops the station if the sampler has stalled.
+
+        Args:
+            changes (Subscription): The subscription to wait on
+            timeout (float): The longest to wait, in seconds, or ``None``
+                to wait as long as it takes
+
+        Returns:
+            tuple: The name and new value of the input that changed, or
+                ``(None, None)`` if the station is shutting down
+
+        Raises:
+            asyncio.TimeoutError: If nothing changed before the timeout
+        """
+        change = asyncio.ensure_future(changes.get())
+        stop = asyncio.ensure_future(self.stopping.wait())
+        try:
+            done, _ = await asyncio.wait(
+                (change, stop), timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            change.cancel()
+            stop.cancel()
+        if stop in done:
+            return None, None
+        if change in done:
+            return change.result()
+        raise asyncio.TimeoutError
+
+    async def enter_state(self, state, due):
+        """Move the main loop into a new state
+
+        Each move is logged with how often the loop woke, how often the
+        inputs were sampled and how many bus calls were made in the state
+        it left, and how long the move took from when it became due. These
+        show how much work the station does in each state.
+
+        Args:
+            state (State): The state to move to
+            due (float): The event loop time the move became due
+        """
+        if state is State.DAY:
+            # Update the displays until it gets dark
+            self.inputs.period = self.config['input_tick_seconds']
+            await self.screen.set_brightness(await self.dial.read())
+            self.weather_display(self.data_log.last_record)
+        elif state is State.NIGHT:
+            # Light the red LED at the end of the LED bar while it's dark
+            # self.ledbar.light_led(10)
+            self.inputs.period = self.config['night_input_tick_seconds']
+            self.screen.text = ''
+            await self.screen.set_brightness(0)
+        else:
+            self.stopping.set()
+        now = asyncio.get_running_loop().time()
+        if self.state is None:
+            logging.info('Starting in the %s state', state.value)
+        else:
+            elapsed = max(now - self.state_entered, 1e-9)
+            logging.info(
+                'Moved from %s to %s in %.1f ms. Spent %.1f s in %s, '
+                'waking %.3f times/s, sampling inputs %.1f times/s and '
+                'making %.1f bus calls/s',
+                self.state.value, state.value, (now - due) * 1000, elapsed,
+                self.state.value, self.wakeups / elapsed,
+                (self.inputs.samples - self.state_samples) / elapsed,
+                (self.bus.calls - self.state_calls) / elapsed
+            )
+        self.state = state
+        self.state_entered = now
+        self.state_calls = self.bus.calls
+        self.state_samples = self.inputs.samples
+        self.wakeups = 0
+
+    def signal_handler(self, signal_received):
         """Handle SIGTERM gracefully so we can run as a service"""
         self.stop_button.press_button()
+        self.stopping.set()
         logging.info('Received %s. Shutting down', signal_received)
 
     async def start(self):
@@ -255,12 +424,15 @@ class WeatherStation:
         """
         # ledbar_start = asyncio.create_task(self.ledbar.start())
         screen_start = asyncio.create_task(self.screen.start(
-            self.dial.value,
+            await self.dial.read(),
             '{:^16s}\n{:^16s}'.format('Welcome to', 'WetSpec')
         ))
         # await ledbar_start
         await screen_start
-        await self.stop_button.start_monitor()
+        await self.data_writer.start()
+        await self.compactor.start()
+        await self.snapshotter.start()
+        await self.inputs.start()
         # while not server_running():
         #     self.screen.text = 'Waiting for\nserver start...'
         #     await asyncio.sleep(1)
@@ -278,19 +450,25 @@ class WeatherStation:
         #     self.ledbar.stop()
         # )
         screen_stop = asyncio.create_task(
-            self.screen.stop(self.dial.value)
+            self.screen.stop(await self.dial.read())
         )
         try:
             await screen_stop
+            await self.compactor.stop()
+            await self.snapshotter.stop()
+            await self.data_writer.stop()
             # await ledbar_stop
-            if not self.stop_button.pressed:
+            if not await self.stop_button.read():
                 self.stop_button.press_button()
-            await self.stop_button.monitor
+            await self.inputs.stop()
+            logging.info('DHT reading cache: %d hits, %d misses',
+                         self.dht.hits, self.dht.misses)
         except CancelledError:
             # Just like in run(), cancelling the screen monitor will
             # occasionally throw a concurrent.futures.CancelledError.
             # We can safely ignore it.
             pass
+        await self.bus.stop()
         logging.info('Shutdown complete')
         logging.info('{:-^39}'.format('-')) # Draw a line to separate runs
 
@@ -302,8 +480,8 @@ class WeatherStation:
         necessitate some creative changes to the colors specified, since
         I can only display one color at a time.
         """
-        temp = int(record['temp'])
-        humidity = int(record['humidity'])
+        temp = int(record.temp)
+        humidity = int(record.humidity)
         if humidity < 80:
             if temp > 95:
                 # This one stays red
@@ -327,12 +505,16 @@ class WeatherStation:
         """Watch for changes in the dashboard server process status"""
         try:
             last_status = server_running()
-            while not self.stop_button.pressed:
+            while not self.stopping.is_set():
                 current_status = server_running()
                 if current_status != last_status:
                     self.weather_display(self.data_log.last_record)
                     last_status = current_status
-                await asyncio.sleep(0.05)
+                try:
+                    await asyncio.wait_for(self.stopping.wait(),
+                                           self.config['server_check_seconds'])
+                except asyncio.TimeoutError:
+                    pass
         except asyncio.CancelledError:
             logging.info('Server monitoring task cancelled')
             return
@@ -345,17 +527,16 @@ class WeatherStation:
         reading, temp and humidity at last reading, and server status
 
         Args:
-            record (dict): a weather record logged in the weatherstation, with:
-                time (str): an ISO 8061 timestamp from `datetime.isoformat()`
+            record (WeatherRecord): a weather record logged in the
+                weatherstation, with:
+                time (float): the UTC epoch time of the reading
                 temp (int): an integer temperature value
                 humidity (int): an integer relative humidity value
         """
-        temp = int(record['temp'])
-        humidity = int(record['humidity'])
+        temp = int(record.temp)
+        humidity = int(record.humidity)
         current_time = dt.datetime.now()
-        last_time = localize(
-            dt.datetime.fromisoformat(self.data_log.last_record['time'])
-        )
+        last_time = localize(record.datetime)
 
         new_screen_text = current_time.strftime('%H:%M')
         new_screen_text += '{:>11}'.format(
@@ -384,10 +565,9 @@ class WeatherStation:
         logging.info('Weather update sequence initiated')
         try:
             while True:
-                current_temp = self.dht.temp('f')
-                current_humidity = self.dht.humidity
+                current_temp, current_humidity = await self.dht.read('f')
                 logging.debug('Temperature reading taken: %d', current_temp)
-                self.data_log.append(
+                await self.data_writer.append(
                     current_temp,
                     current_humidity,
                     self.config['sampling_period']